@@ -1,8 +1,101 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import OuterRef, Subquery
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
-from .models import Flat, Complaint, Owner
+from .buildings import recompute_new_buildings
+from .models import Flat, Complaint, Owner, Town
+from .pagination import EstimatedCountPaginator
+from .routers import use_replica
+from .towns import get_town_names
+
+EXACT_COUNT_VAR = 'exact_count'
+
+
+class EstimatedCountMixin:
+    """Список без полного COUNT(*): число строк оценивается.
+
+    Точное число можно запросить, добавив к адресу ?exact_count=1.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        request.exact_count = EXACT_COUNT_VAR in request.GET
+        if request.exact_count:
+            request.GET = request.GET.copy()
+            del request.GET[EXACT_COUNT_VAR]
+        return super().changelist_view(request, extra_context)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        paginator = self.paginator
+        if getattr(request, 'exact_count', False):
+            paginator = Paginator
+        return paginator(queryset, per_page, orphans, allow_empty_first_page)
+
+
+class TownListFilter(admin.SimpleListFilter):
+    """Города берутся из справочника Town, а не DISTINCT по квартирам."""
+    title = _('Город')
+    parameter_name = 'town'
+
+    def lookups(self, request, model_admin):
+        return [(name, name) for name in get_town_names()]
+
+    def has_output(self):
+        # Города может не быть в справочнике; без этого фильтр скрылся бы
+        # и список показал бы все квартиры.
+        return bool(self.value()) or super().has_output()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(town=self.value())
+        return queryset
+
+
+class ConstructionYearListFilter(admin.SimpleListFilter):
+    """Интервалы годов постройки из CONSTRUCTION_YEAR_BUCKETS."""
+    title = _('Год постройки')
+    parameter_name = 'construction_year_range'
+
+    def lookups(self, request, model_admin):
+        bounds = settings.CONSTRUCTION_YEAR_BUCKETS
+        choices = [(f'-{bounds[0]}', f'до {bounds[0]}')]
+        for start, end in zip(bounds, bounds[1:]):
+            choices.append((f'{start}-{end}', f'{start}–{end - 1}'))
+        choices.append((f'{bounds[-1]}-', f'с {bounds[-1]}'))
+        return choices
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            start, end = [
+                int(year) if year else None
+                for year in self.value().split('-')
+            ]
+        except ValueError:
+            return queryset
+        if start is not None:
+            queryset = queryset.filter(construction_year__gte=start)
+        if end is not None:
+            queryset = queryset.filter(construction_year__lt=end)
+        return queryset
+
+
+class ReplicaChangeListMixin:
+    def changelist_view(self, request, extra_context=None):
+        if request.method not in ('GET', 'HEAD'):
+            return super().changelist_view(request, extra_context)
+        with use_replica():
+            response = super().changelist_view(request, extra_context)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+
 
 class ComplaintInline(admin.TabularInline):
     model = Complaint
@@ -41,7 +134,8 @@ class OwnerThroughInline(admin.TabularInline):
     owner_pure_phone.short_description = _('Телефон')
 
 @admin.register(Flat)
-class FlatAdmin(admin.ModelAdmin):
+class FlatAdmin(EstimatedCountMixin, ReplicaChangeListMixin,
+                admin.ModelAdmin):
     list_display = [
         'address',
         'price',
@@ -70,40 +164,59 @@ class FlatAdmin(admin.ModelAdmin):
     
     list_editable = ['new_building']
     search_fields = ['town', 'address', 'owners__full_name']
-    list_filter = ['new_building', 'town', 'construction_year']
+    list_filter = [
+        'new_building',
+        TownListFilter,
+        ConstructionYearListFilter,
+    ]
     readonly_fields = ['created_at']
     inlines = [ComplaintInline, OwnerThroughInline, LikeInline]
     raw_id_fields = ['liked_by']
     filter_horizontal = ('liked_by',)
+    actions = ['recompute_new_building']
+
+    def recompute_new_building(self, request, queryset):
+        changed = recompute_new_buildings(queryset)
+        self.message_user(request, f'Исправлен признак новостройки: {changed}')
+    recompute_new_building.short_description = _(
+        'Пересчитать признак новостройки по году постройки'
+    )
 
     def display_owner_name(self, obj):
-        owner = obj.owners.first()
-        return owner.full_name if owner else "Не указан"
+        return obj.owner_name or "Не указан"
     display_owner_name.short_description = 'Владелец'
+    display_owner_name.admin_order_field = 'owner_name'
 
     def display_owner_phone(self, obj):
-        owner = obj.owners.first()
-        return str(owner.pure_phone) if owner and owner.pure_phone else "-"
+        return obj.owner_phone or "-"
     display_owner_phone.short_description = 'Номер владельца'
-    
+
     def display_pure_phone(self, obj):
-        owner = obj.owners.first()
-        return owner.pure_phone if owner else "-"
+        return obj.owner_phone if obj.owner_name is not None else "-"
     display_pure_phone.short_description = 'Нормализованный номер'
 
     def display_complaints_count(self, obj):
-        return obj.complaints.count()
+        return obj.complaints_count
     display_complaints_count.short_description = _('Количество жалоб')
+    display_complaints_count.admin_order_field = 'complaints_count'
 
     def display_likes_count(self, obj):
-        return obj.liked_by.count()
+        return obj.likes_count
     display_likes_count.short_description = _('Лайков')
+    display_likes_count.admin_order_field = 'likes_count'
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('owners')
+        primary_owner = Owner.objects.filter(
+            flats=OuterRef('pk')
+        ).order_by('pk')
+        return super().get_queryset(request).annotate(
+            owner_name=Subquery(primary_owner.values('full_name')[:1]),
+            owner_phone=Subquery(primary_owner.values('pure_phone')[:1]),
+        )
 
 @admin.register(Complaint)
-class ComplaintAdmin(admin.ModelAdmin):
+class ComplaintAdmin(EstimatedCountMixin, ReplicaChangeListMixin,
+                     admin.ModelAdmin):
     list_display = [
         'user',
         'flat',
@@ -125,8 +238,9 @@ class ComplaintAdmin(admin.ModelAdmin):
     truncated_text.short_description = _('Текст жалобы')
 
 @admin.register(Owner)
-class OwnerAdmin(admin.ModelAdmin):
-    list_display = ['full_name', 'display_phone', 'flats_count']
+class OwnerAdmin(EstimatedCountMixin, ReplicaChangeListMixin,
+                 admin.ModelAdmin):
+    list_display = ['full_name', 'display_phone', 'display_flats_count']
     search_fields = ['full_name', 'pure_phone']
     raw_id_fields = ['flats']
     filter_horizontal = ('flats',)
@@ -135,6 +249,13 @@ class OwnerAdmin(admin.ModelAdmin):
         return obj.pure_phone.as_international if obj.pure_phone else "Не указан"
     display_phone.short_description = 'Номер владельца'
     
-    def flats_count(self, obj):
-        return obj.flats.count()
-    flats_count.short_description = 'Количество квартир'
\ No newline at end of file
+    def display_flats_count(self, obj):
+        return obj.flats_count
+    display_flats_count.short_description = 'Количество квартир'
+    display_flats_count.admin_order_field = 'flats_count'
+
+@admin.register(Town)
+class TownAdmin(admin.ModelAdmin):
+    list_display = ['name', 'flats_count', 'active_flats_count']
+    search_fields = ['name']
+    readonly_fields = ['flats_count', 'active_flats_count']
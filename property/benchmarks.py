@@ -0,0 +1,187 @@
+import itertools
+import math
+import random
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from property import views
+from property.models import Flat, Owner, Town
+from property.phones import normalize_phone, normalize_phones
+from property.seed import make_raw_phone
+
+
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+SEARCH_QUERIES = ['балкон', 'ремонт метро', 'ленина']
+
+
+def percentile(timings, share):
+    ordered = sorted(timings)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+def measure(func, repeat):
+    """Прогоняет func repeat раз и возвращает запросы, задержку и память.
+
+    Пиковая память снимается отдельным прогоном: tracemalloc сильно
+    замедляет код и испортил бы замер времени.
+    """
+    func()
+    timings = []
+    for _ in range(repeat):
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connection))
+                for connection in connections.all()
+            ]
+            started_at = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started_at) * 1000)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'queries': sum(len(queries) for queries in captured),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'peak_kb': round(peak / 1024),
+        'runs': repeat,
+    }
+
+
+def get_request(path, params=None, user=None):
+    request = RequestFactory().get(path, params or {})
+    request.user = user or AnonymousUser()
+    request.session = {}
+    return request
+
+
+def iter_listing_params():
+    """Все сочетания фильтров главной страницы."""
+    town = Town.objects.order_by('-flats_count').values_list(
+        'name', flat=True
+    ).first()
+    prices = Flat.objects.order_by('price').values_list('price', flat=True)
+    count = prices.count()
+    low = prices[count // 4] if count else 0
+    high = prices[count * 3 // 4] if count else 0
+    price_filters = [
+        {}, {'min_price': low}, {'max_price': high},
+        {'min_price': low, 'max_price': high},
+    ]
+    for has_town, price_filter, new_building, sort, search in (
+        itertools.product(
+            [False, True], price_filters, [False, True],
+            ['price', 'date', 'area'], [False, True],
+        )
+    ):
+        params = dict(price_filter, sort=sort)
+        if has_town and town:
+            params['town'] = town
+        if new_building:
+            params['new_building'] = '1'
+        if search:
+            params['q'] = SEARCH_QUERIES[0]
+        yield params
+
+
+def format_params(params):
+    return '&'.join(f'{name}={value}' for name, value in sorted(params.items()))
+
+
+def get_cases():
+    cases = {}
+    for params in iter_listing_params():
+        name = f'show_flats?{format_params(params)}'
+        cases[name] = lambda params=params: views.show_flats(
+            get_request('/', params)
+        )
+
+    for query in SEARCH_QUERIES:
+        cases[f'search {query}'] = lambda query=query: views.flats_api(
+            get_request('/api/flats/', {'q': query})
+        )
+
+    superuser = get_user_model()(
+        username='bench-admin', is_staff=True, is_superuser=True,
+        is_active=True
+    )
+    for model, params in [
+        (Flat, {}), (Flat, {'q': 'Ленина'}), (Owner, {}),
+        (Owner, {'q': 'Иванов'}),
+    ]:
+        model_admin = admin.site._registry[model]
+        name = f'admin {model._meta.model_name}'
+        if params:
+            name += f'?{format_params(params)}'
+        cases[name] = lambda model_admin=model_admin, params=params: (
+            model_admin.changelist_view(
+                get_request('/admin/', params, superuser)
+            ).render()
+        )
+
+    rng = random.Random(0)
+    raw_phones = [make_raw_phone(rng) for _ in range(5000)]
+    raw_phones += rng.choices(raw_phones, k=5000)
+
+    def normalize():
+        normalize_phone.cache_clear()
+        normalize_phones(raw_phones)
+
+    cases['normalize_phones 10000'] = normalize
+    return cases
+
+
+def get_dataset():
+    return {
+        'flats': Flat.objects.count(),
+        'owners': Owner.objects.count(),
+    }
+
+
+def run(repeat=5, only=None):
+    """Прогоняет сценарии без кеша страниц и карточек.
+
+    Генератор пар (название сценария, результат measure).
+    """
+    with override_settings(CACHES=NO_CACHE):
+        for name, func in get_cases().items():
+            if only and only not in name:
+                continue
+            yield name, measure(func, repeat)
+
+
+def compare(report, baseline, tolerance=0.2):
+    """Ищет регрессии относительно сохранённого отчёта.
+
+    Регрессия — больше SQL-запросов, чем в базовом отчёте, или p95
+    медленнее больше чем на tolerance.
+    """
+    regressions = []
+    for name, result in report['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: запросов {base["queries"]} -> {result["queries"]}'
+            )
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {base["p95_ms"]} -> {result["p95_ms"]} мс'
+            )
+    return regressions
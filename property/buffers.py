@@ -0,0 +1,120 @@
+import atexit
+import logging
+import threading
+
+from django.db import IntegrityError, close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+
+def drop_missing(items, references):
+    """Оставляет записи, внешние ключи которых есть в базе.
+
+    items — кортежи, references — {позиция в кортеже: модель}. Пока
+    запись ждала в буфере, квартиру или пользователя могли удалить.
+    """
+    items = list(items)
+    for position, model in references.items():
+        existing = set(model.objects.filter(
+            pk__in={item[position] for item in items}
+        ).values_list('pk', flat=True))
+        items = [item for item in items if item[position] in existing]
+    return items
+
+
+class WriteBuffer:
+    """Копит записи в памяти процесса и сбрасывает их пачками.
+
+    Записи с одинаковым ключом схлопываются: остаётся последняя.
+    Сброс происходит, когда накопилось max_size записей, или в фоновом
+    потоке раз в flush_interval секунд, или при завершении процесса.
+    flush_func получает список записей и пишет их в базу одной пачкой.
+    """
+
+    def __init__(self, flush_func, max_size=1000, flush_interval=1.0,
+                 background=True):
+        self.flush_func = flush_func
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.background = background
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        atexit.register(self.flush)
+
+    def add(self, key, item):
+        with self.lock:
+            self.pending[key] = item
+            size = len(self.pending)
+        if size >= self.max_size:
+            self.flush()
+        elif self.background:
+            self.start()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def flush(self):
+        """Пишет накопленные записи, возвращает, сколько записано.
+
+        Не бросает исключений: add() вызывает flush() из потока запроса.
+        Записи, которые не удалось записать из-за временной ошибки базы,
+        возвращаются в буфер до следующего сброса.
+        """
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            if not pending:
+                return 0
+            failed = self.write(pending)
+            if failed:
+                with self.lock:
+                    for key, item in failed.items():
+                        self.pending.setdefault(key, item)
+            return len(pending) - len(failed)
+
+    def write(self, pending):
+        """Пишет пачку и возвращает записи, которые стоит повторить.
+
+        Если пачку отвергли ограничения базы, записи пишутся по одной,
+        чтобы одна испорченная запись не держала остальные. Записи,
+        которые сами нарушают ограничения, отбрасываются: повтор их
+        не исправит.
+        """
+        try:
+            self.flush_func(list(pending.values()))
+        except IntegrityError:
+            if len(pending) == 1:
+                logger.warning(
+                    'Запись отброшена, её нельзя записать: %r',
+                    next(iter(pending.values()))
+                )
+                return {}
+            failed = {}
+            for key, item in pending.items():
+                failed.update(self.write({key: item}))
+            return failed
+        except Exception:
+            logger.exception('Не удалось сбросить буфер записи')
+            return pending
+        return {}
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='write-buffer', daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        while not self.wakeup.wait(self.flush_interval):
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
@@ -0,0 +1,18 @@
+from property.cache import bump_listing_version
+from property.models import Flat
+
+
+def recompute_new_buildings(flats=None):
+    """Пересчитывает признак новостройки по году постройки.
+
+    Нужен после смены NEW_BUILDING_YEAR и после записей в обход модели.
+    Изменённые квартиры уходят в шарды из QuerySet.update(), кеш списка
+    сбрасывается.
+    Возвращает, сколько квартир изменилось.
+    """
+    if flats is None:
+        flats = Flat.objects.all()
+    flat_ids = flats.recompute_new_building()
+    if flat_ids:
+        bump_listing_version()
+    return len(flat_ids)
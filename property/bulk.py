@@ -0,0 +1,17 @@
+def insert_returning_pks(model, objects):
+    """bulk_create, после которого у всех объектов заполнен pk.
+
+    SQLite в Django 2.2 не возвращает id из bulk_create, но внутри
+    транзакции запись в базу эксклюзивная, поэтому новые строки — это
+    последние len(objects) id таблицы.
+    """
+    if not objects:
+        return objects
+    objects = model.objects.bulk_create(objects)
+    if objects[0].pk is None:
+        pks = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:len(objects)]
+        for obj, pk in zip(objects, reversed(list(pks))):
+            obj.pk = pk
+    return objects
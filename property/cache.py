@@ -0,0 +1,68 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from property.routers import is_replica_configured
+
+
+LISTING_VERSION_KEY = 'property:listing-version'
+
+
+def get_listing_version():
+    version = cache.get(LISTING_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(LISTING_VERSION_KEY, version, None):
+            version = cache.get(LISTING_VERSION_KEY, version)
+    return version
+
+
+def get_listing_last_modified():
+    """Время последнего изменения квартир или собственников.
+
+    Версия списка — это время её смены в наносекундах, поэтому из неё
+    же получается Last-Modified.
+    """
+    return datetime.fromtimestamp(
+        get_listing_version() / 10 ** 9, tz=timezone.utc
+    )
+
+
+def is_listing_settled():
+    """Можно ли кешировать данные списка, прочитанные с реплики.
+
+    Первые REPLICA_STICKY_SECONDS после смены версии реплика может ещё
+    не видеть изменений. Страница, прочитанная с неё в это время, попала
+    бы в кеш под новой версией и жила бы дольше отставания реплики.
+    """
+    if not is_replica_configured():
+        return True
+    age = time.time_ns() - get_listing_version()
+    return age > settings.REPLICA_STICKY_SECONDS * 10 ** 9
+
+
+def bump_listing_version():
+    """Делает недействительными все закешированные страницы со списком."""
+    cache.set(LISTING_VERSION_KEY, time.time_ns(), None)
+
+
+def get_listing_cache_key(params, version=None, prefix='listing'):
+    if version is None:
+        version = get_listing_version()
+    digest = hashlib.md5(
+        json.dumps(params, sort_keys=True).encode()
+    ).hexdigest()
+    return f'property:{prefix}:{version}:{digest}'
+
+
+def get_listing_page(cache_key):
+    return cache.get(cache_key)
+
+
+def set_listing_page(cache_key, content):
+    cache.set(cache_key, content, settings.LISTING_CACHE_TIMEOUT)
+
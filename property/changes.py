@@ -0,0 +1,37 @@
+from django.db.models import Q
+
+from property.models import Flat, FlatTombstone
+
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+
+def get_changes(since=0, after=0, limit=100, fields=None):
+    """Возвращает изменения квартир после позиции (since, after).
+
+    Позиция — это версия и id последнего полученного изменения: одну
+    версию может получить сразу много квартир, если их изменили одним
+    QuerySet.update(). Результат — список словарей op, version, id и,
+    для upsert, flat с полями fields, упорядоченный по (version, id).
+    """
+    flats = Flat.objects.filter(
+        Q(version__gt=since) | Q(version=since, pk__gt=after)
+    ).order_by('version', 'pk')
+    if fields is not None:
+        flats = flats.only('version', *fields)
+    tombstones = FlatTombstone.objects.filter(
+        Q(version__gt=since) | Q(version=since, flat_id__gt=after)
+    ).order_by('version', 'flat_id')
+
+    changes = [
+        {'op': UPSERT, 'version': flat.version, 'id': flat.pk, 'flat': flat}
+        for flat in flats[:limit]
+    ] + [
+        {'op': DELETE, 'version': version, 'id': flat_id}
+        for version, flat_id in tombstones.values_list(
+            'version', 'flat_id'
+        )[:limit]
+    ]
+    changes.sort(key=lambda change: (change['version'], change['id']))
+    return changes[:limit]
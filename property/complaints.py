@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from property import counters
+from property.buffers import WriteBuffer, drop_missing
+from property.models import Complaint, Flat
+from property.ratelimit import TokenBucket
+
+
+TEXT_MAX_LENGTH = 2000
+
+ACCEPTED = 'accepted'
+DUPLICATE = 'duplicate'
+RATE_LIMITED = 'rate_limited'
+
+
+def apply_complaints(complaints):
+    """Записывает пачку (user_id, flat_id, text) одним bulk_create.
+
+    Пары пользователь–квартира, на которые жалоба уже есть в базе,
+    пропускаются: кешированная дедупликация живёт ограниченное время.
+    Жалобы на удалённые квартиры и от удалённых пользователей тоже.
+    """
+    with transaction.atomic():
+        complaints = drop_missing(
+            complaints, {0: get_user_model(), 1: Flat}
+        )
+        flat_ids = {flat_id for _, flat_id, _ in complaints}
+        existing = set(Complaint.objects.filter(
+            flat_id__in=flat_ids,
+            user_id__in={user_id for user_id, _, _ in complaints},
+        ).values_list('user_id', 'flat_id'))
+        Complaint.objects.bulk_create([
+            Complaint(user_id=user_id, flat_id=flat_id, text=text)
+            for user_id, flat_id, text in complaints
+            if (user_id, flat_id) not in existing
+        ])
+        counters.refresh_complaints_count(flat_ids)
+
+
+complaint_buffer = WriteBuffer(
+    apply_complaints,
+    max_size=settings.COMPLAINTS_BUFFER_SIZE,
+    flush_interval=settings.COMPLAINTS_FLUSH_INTERVAL,
+)
+
+
+def submit_complaint(user_id, flat_id, text, buffer=complaint_buffer):
+    """Принимает жалобу, не трогая базу.
+
+    Сначала проверяется лимит пользователя, затем повтор жалобы на ту же
+    квартиру; принятая жалоба уходит в буфер и пишется пачкой.
+    """
+    bucket = TokenBucket(
+        f'complaints:{user_id}',
+        rate=settings.COMPLAINTS_RATE,
+        capacity=settings.COMPLAINTS_BURST,
+    )
+    if not bucket.consume():
+        return RATE_LIMITED
+    dedup_key = f'property:complaint:{user_id}:{flat_id}'
+    if not cache.add(dedup_key, True, settings.COMPLAINTS_DEDUP_TIMEOUT):
+        return DUPLICATE
+    buffer.add(
+        (user_id, flat_id), (user_id, flat_id, text[:TEXT_MAX_LENGTH])
+    )
+    return ACCEPTED
@@ -0,0 +1,46 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from property.models import Complaint, Flat, Owner
+
+
+def _count_subquery(model, field):
+    counts = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def _restrict(queryset, pks):
+    if pks is None:
+        return queryset
+    return queryset.filter(pk__in=list(pks))
+
+
+def refresh_likes_count(flat_ids=None):
+    """Пересчитывает Flat.likes_count одним UPDATE. None — для всех квартир."""
+    return _restrict(Flat.objects.all(), flat_ids).update(
+        likes_count=_count_subquery(Flat.liked_by.through, 'flat_id')
+    )
+
+
+def refresh_complaints_count(flat_ids=None):
+    """Пересчитывает Flat.complaints_count одним UPDATE."""
+    return _restrict(Flat.objects.all(), flat_ids).update(
+        complaints_count=_count_subquery(Complaint, 'flat_id')
+    )
+
+
+def refresh_flats_count(owner_ids=None):
+    """Пересчитывает Owner.flats_count одним UPDATE."""
+    return _restrict(Owner.objects.all(), owner_ids).update(
+        flats_count=_count_subquery(Owner.flats.through, 'owner_id')
+    )
+
+
+def rebuild_all():
+    return {
+        'likes': refresh_likes_count(),
+        'complaints': refresh_complaints_count(),
+        'owners': refresh_flats_count(),
+    }
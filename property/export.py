@@ -0,0 +1,91 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from property.models import Owner
+
+
+EXPORT_FIELDS = [
+    'id',
+    'created_at',
+    'town',
+    'town_district',
+    'address',
+    'floor',
+    'rooms_number',
+    'living_area',
+    'has_balcony',
+    'active',
+    'construction_year',
+    'new_building',
+    'price',
+    'description',
+]
+CSV_HEADER = EXPORT_FIELDS + ['owners', 'owner_phones']
+CHUNK_SIZE = 2000
+
+
+def get_owners(flat_ids):
+    owners = defaultdict(list)
+    rows = Owner.flats.through.objects.filter(
+        flat_id__in=flat_ids
+    ).order_by('owner_id').values_list(
+        'flat_id', 'owner__full_name', 'owner__pure_phone'
+    )
+    for flat_id, full_name, phone in rows:
+        owners[flat_id].append({
+            'full_name': full_name,
+            'phone': str(phone) if phone else '',
+        })
+    return owners
+
+
+def iter_flats(flats, chunk_size=CHUNK_SIZE):
+    """Отдаёт квартиры по одной вместе с собственниками.
+
+    Квартиры читаются через .iterator(), на PostgreSQL это серверный
+    курсор. Собственники подгружаются одним запросом на каждые
+    chunk_size квартир, поэтому память не растёт с размером выгрузки.
+    """
+    rows = flats.order_by('pk').values(*EXPORT_FIELDS).iterator(
+        chunk_size=chunk_size
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        owners = get_owners([row['id'] for row in chunk])
+        for row in chunk:
+            row['owners'] = owners.get(row['id'], [])
+            yield row
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        yield writer.writerow(
+            [row[name] for name in EXPORT_FIELDS] + [
+                '; '.join(owner['full_name'] for owner in row['owners']),
+                '; '.join(owner['phone'] for owner in row['owners']),
+            ]
+        )
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from property.cache import get_listing_cache_key, is_listing_settled
+from property.listing import filter_flats
+
+
+def get_price_buckets(bounds=None):
+    """Границы [a, b] превращает в интервалы (None, a), (a, b), (b, None)."""
+    if bounds is None:
+        bounds = settings.FLAT_PRICE_BUCKETS
+    bounds = sorted(set(bounds))
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def get_price_condition(lower, upper):
+    condition = Q()
+    if lower is not None:
+        condition &= Q(price__gte=lower)
+    if upper is not None:
+        condition &= Q(price__lt=upper)
+    return condition
+
+
+def count_facets(params, bounds=None):
+    """Считает все фасеты одним запросом с GROUP BY rooms_number.
+
+    Внутри каждой группы условные COUNT считают новостройки, балконы и
+    ценовые интервалы, итог по остальным фасетам — сумма по группам.
+    """
+    buckets = get_price_buckets(bounds)
+    aggregates = {
+        'total': Count('pk'),
+        'new_building_true': Count('pk', filter=Q(new_building=True)),
+        'new_building_false': Count('pk', filter=Q(new_building=False)),
+        'has_balcony_true': Count('pk', filter=Q(has_balcony=True)),
+        'has_balcony_false': Count('pk', filter=Q(has_balcony=False)),
+    }
+    for index, (lower, upper) in enumerate(buckets):
+        aggregates[f'price_{index}'] = Count(
+            'pk', filter=get_price_condition(lower, upper)
+        )
+
+    rows = list(
+        filter_flats(params).order_by().values('rooms_number').annotate(
+            **aggregates
+        ).order_by('rooms_number')
+    )
+
+    def total(name):
+        return sum(row[name] for row in rows)
+
+    flats_count = total('total')
+    return {
+        'total': flats_count,
+        'rooms_number': [
+            {'value': row['rooms_number'], 'count': row['total']}
+            for row in rows
+        ],
+        'price': [
+            {'min': lower, 'max': upper, 'count': total(f'price_{index}')}
+            for index, (lower, upper) in enumerate(buckets)
+        ],
+        'new_building': {
+            'true': total('new_building_true'),
+            'false': total('new_building_false'),
+            'unknown': flats_count - total('new_building_true')
+            - total('new_building_false'),
+        },
+        'has_balcony': {
+            'true': total('has_balcony_true'),
+            'false': total('has_balcony_false'),
+            'unknown': flats_count - total('has_balcony_true')
+            - total('has_balcony_false'),
+        },
+    }
+
+
+def get_facets(params):
+    """Фасеты из кеша. Ключ — фильтры, границы цен и версия списка."""
+    bounds = settings.FLAT_PRICE_BUCKETS
+    cache_key = get_listing_cache_key(
+        dict(params, price_buckets=bounds), prefix='facets'
+    )
+    facets = cache.get(cache_key)
+    if facets is None:
+        facets = count_facets(params, bounds)
+        if is_listing_settled():
+            cache.set(cache_key, facets, settings.LISTING_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,209 @@
+import csv
+import json
+import sys
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+
+from property import search, shards, towns
+from property.bulk import insert_returning_pks
+from property.cache import bump_listing_version
+from property.models import FLAT_VERSION_SEQUENCE, Flat, Sequence
+from property.owners import OwnerReconciler
+
+
+FLAT_FIELDS = [
+    'created_at',
+    'description',
+    'price',
+    'town',
+    'town_district',
+    'address',
+    'floor',
+    'rooms_number',
+    'living_area',
+    'has_balcony',
+    'active',
+    'construction_year',
+]
+REQUIRED_FIELDS = ['price', 'town', 'address', 'rooms_number']
+DEFAULTS = {'active': True}
+# В дополнение к True/False/1/0/t/f, которые понимает BooleanField.
+BOOLEAN_VALUES = {'true': True, 'yes': True, 'false': False, 'no': False}
+
+
+class RowError(ValueError):
+    pass
+
+
+def check_row(row):
+    """Читатели отдают RowError вместо строки, которую не разобрать."""
+    if isinstance(row, RowError):
+        raise row
+    return row
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as error:
+            yield RowError(f'неверный JSON: {error.msg}, символ {error.pos + 1}')
+            continue
+        if isinstance(row, dict):
+            yield row
+        else:
+            yield RowError('строка должна быть объектом JSON')
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def get_reader(path, file_format=None):
+    """Читатель строк для файла: по file_format или по расширению."""
+    file_format = file_format or path.rsplit('.', 1)[-1].lower()
+    if file_format not in READERS:
+        raise ValueError('Укажите формат файла: --format csv или jsonl')
+    return READERS[file_format]
+
+
+@contextmanager
+def open_stream(path):
+    """Открывает файл для чтения, - означает stdin."""
+    if path == '-':
+        yield sys.stdin
+        return
+    with open(path, encoding='utf-8', newline='') as stream:
+        yield stream
+
+
+def build_flat(row):
+    row = check_row(row)
+    values = {}
+    for name in FLAT_FIELDS:
+        value = row.get(name)
+        if value in (None, ''):
+            if name in REQUIRED_FIELDS:
+                raise RowError(f'не заполнено поле {name}')
+            if name in DEFAULTS:
+                values[name] = DEFAULTS[name]
+            continue
+        field = Flat._meta.get_field(name)
+        if isinstance(field, models.BooleanField) and isinstance(value, str):
+            value = BOOLEAN_VALUES.get(value.strip().lower(), value)
+        try:
+            values[name] = field.to_python(value)
+        except ValidationError as error:
+            raise RowError(f'{name}: {"; ".join(error.messages)}')
+    flat = Flat(**values)
+    flat.update_new_building()
+    return flat
+
+
+def build_link(row):
+    """Тройка (id квартиры, ФИО, телефон) из строки файла собственников."""
+    row = check_row(row)
+    flat_id = str(row.get('flat_id') or '').strip()
+    if not flat_id:
+        raise RowError('не заполнено поле flat_id')
+    try:
+        flat_id = int(flat_id)
+    except ValueError:
+        raise RowError(f'flat_id: «{flat_id}» не число')
+    return flat_id, row.get('owner'), row.get('owner_phone')
+
+
+def count_towns(flats):
+    counts = defaultdict(lambda: [0, 0])
+    for flat in flats:
+        counts[flat.town][0] += 1
+        counts[flat.town][1] += int(flat.active)
+    return counts
+
+
+def import_batch(rows, reconciler):
+    flats, owners, errors = [], [], []
+    for line_number, row in rows:
+        try:
+            flat = build_flat(row)
+        except RowError as error:
+            errors.append((line_number, str(error)))
+            continue
+        flats.append(flat)
+        owners.append((row.get('owner'), row.get('owner_phone')))
+
+    with transaction.atomic():
+        version = Sequence.next_value(FLAT_VERSION_SEQUENCE)
+        for flat in flats:
+            flat.version = version
+        flats = insert_returning_pks(Flat, flats)
+        new_owners, _ = reconciler.reconcile(
+            (flat.pk, full_name, phone)
+            for flat, (full_name, phone) in zip(flats, owners)
+        )
+        for town, (flats_count, active_count) in count_towns(flats).items():
+            towns.adjust_town(town, flats_count, active_count)
+        search.index_flats([flat.pk for flat in flats])
+        shards.schedule_sync([flat.pk for flat in flats])
+
+    return len(flats), new_owners, errors
+
+
+def reconcile_batch(rows, reconciler):
+    """Связывает квартиры пачки с собственниками.
+
+    rows — пары (номер строки, словарь). Строки без квартиры в базе
+    пропускаются и возвращаются среди ошибок.
+    """
+    records, errors = [], []
+    for line_number, row in rows:
+        try:
+            records.append((line_number, build_link(row)))
+        except RowError as error:
+            errors.append((line_number, str(error)))
+
+    flat_ids = set(Flat.objects.filter(
+        pk__in={flat_id for _, (flat_id, _, _) in records}
+    ).values_list('pk', flat=True))
+    links = []
+    for line_number, record in records:
+        if record[0] in flat_ids:
+            links.append(record)
+        else:
+            errors.append((line_number, f'квартира {record[0]} не найдена'))
+    errors.sort()
+
+    new_owners, new_links = reconciler.reconcile(links)
+    return new_owners, new_links, errors
+
+
+def import_flats(rows, batch_size=1000):
+    """Загружает квартиры пачками и возвращает статистику по каждой пачке.
+
+    rows — итератор словарей с полями Flat и полями owner, owner_phone.
+    В памяти одновременно держится не больше batch_size строк файла,
+    плюс индекс собственников OwnerReconciler.
+    """
+    numbered_rows = enumerate(rows, start=1)
+    reconciler = OwnerReconciler()
+    try:
+        while True:
+            batch = list(islice(numbered_rows, batch_size))
+            if not batch:
+                break
+            yield import_batch(batch, reconciler)
+    finally:
+        bump_listing_version()
@@ -0,0 +1,122 @@
+import os
+import re
+import threading
+import time
+import traceback
+from collections import Counter
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+
+_state = threading.local()
+
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER_RE = re.compile(r'\b\d+\b')
+LIBRARY_DIRS = ('site-packages', 'dist-packages', f'{os.sep}django{os.sep}')
+
+
+def get_query_shape(sql):
+    """SQL без конкретных значений: запросы одной формы отличаются
+    только параметрами, длиной списка в IN и числами в LIMIT."""
+    return NUMBER_RE.sub('?', IN_LIST_RE.sub('IN (...)', sql))
+
+
+def get_call_site():
+    """Ближайший к запросу кадр стека из кода проекта."""
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = frame.filename
+        if filename == __file__ or not filename.startswith(settings.BASE_DIR):
+            continue
+        if any(part in filename for part in LIBRARY_DIRS):
+            continue
+        path = os.path.relpath(filename, settings.BASE_DIR)
+        return f'{path}:{frame.lineno} in {frame.name}'
+    return 'неизвестно'
+
+
+class RequestStats:
+    """Собирает статистику запроса: SQL, время в базе и в шаблонах.
+
+    Экземпляр вешается на соединения через connection.execute_wrapper.
+    Стек вызовов снимается только для формы запроса, которая повторилась
+    n_plus_one_threshold раз, поэтому обычные запросы почти ничего
+    не стоят.
+    """
+
+    def __init__(self, n_plus_one_threshold):
+        self.started_at = time.perf_counter()
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.shapes = Counter()
+        self.repeated = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started_at
+            self.queries += 1
+            shape = get_query_shape(sql)
+            self.shapes[shape] += 1
+            if self.shapes[shape] == self.n_plus_one_threshold:
+                self.repeated[shape] = get_call_site()
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started_at
+
+    def get_repeated_queries(self):
+        return [
+            (shape, self.shapes[shape], call_site)
+            for shape, call_site in self.repeated.items()
+        ]
+
+    def get_server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+def get_current_stats():
+    return getattr(_state, 'stats', None)
+
+
+def set_current_stats(stats):
+    _state.stats = stats
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = get_current_stats()
+        if stats is None or stats.template_depth:
+            return super().render(context, request)
+        stats.template_depth += 1
+        started_at = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started_at
+            stats.template_depth -= 1
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, который считает время рендера для
+    QueryInstrumentationMiddleware. Время шаблона включает запросы,
+    которые выполнились во время рендера."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
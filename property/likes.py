@@ -0,0 +1,78 @@
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from property import counters
+from property.buffers import WriteBuffer, drop_missing
+from property.models import Flat
+
+
+DELETE_BATCH_SIZE = 500
+
+
+def get_pending_key(user_id):
+    return f'property:likes:pending:{user_id}'
+
+
+def apply_likes(likes):
+    """Применяет пачку (user_id, flat_id, liked) к таблице лайков.
+
+    Лайки удалённых квартир и пользователей пропускаются.
+    """
+    Through = Flat.liked_by.through
+    with transaction.atomic():
+        likes = drop_missing(likes, {0: get_user_model(), 1: Flat})
+        added = [
+            (user_id, flat_id) for user_id, flat_id, liked in likes if liked
+        ]
+        removed = [
+            (user_id, flat_id)
+            for user_id, flat_id, liked in likes if not liked
+        ]
+        Through.objects.bulk_create(
+            [
+                Through(user_id=user_id, flat_id=flat_id)
+                for user_id, flat_id in added
+            ],
+            ignore_conflicts=True
+        )
+        for start in range(0, len(removed), DELETE_BATCH_SIZE):
+            Through.objects.filter(reduce(or_, (
+                Q(user_id=user_id, flat_id=flat_id)
+                for user_id, flat_id in removed[start:start + DELETE_BATCH_SIZE]
+            ))).delete()
+        counters.refresh_likes_count({flat_id for _, flat_id, _ in likes})
+
+
+like_buffer = WriteBuffer(
+    apply_likes,
+    max_size=settings.LIKES_BUFFER_SIZE,
+    flush_interval=settings.LIKES_FLUSH_INTERVAL,
+)
+
+
+def set_like(user_id, flat_id, liked, buffer=like_buffer):
+    """Ставит или снимает лайк через буфер.
+
+    Пока запись не сброшена в базу, её видно самому пользователю: намерение
+    сохраняется в кеше и учитывается в get_like_state.
+    """
+    pending_key = get_pending_key(user_id)
+    pending = cache.get(pending_key) or {}
+    pending[flat_id] = liked
+    cache.set(pending_key, pending, settings.LIKES_PENDING_TIMEOUT)
+    buffer.add((user_id, flat_id), (user_id, flat_id, liked))
+
+
+def get_like_state(user_id, flat_id, likes_count):
+    """Возвращает (лайкнул ли пользователь, число лайков) с учётом буфера."""
+    stored = Flat.liked_by.through.objects.filter(
+        user_id=user_id, flat_id=flat_id
+    ).exists()
+    liked = (cache.get(get_pending_key(user_id)) or {}).get(flat_id, stored)
+    return liked, likes_count + int(liked) - int(stored)
@@ -0,0 +1,99 @@
+from property.models import Flat
+from property.pagination import KeysetPaginator, MergedKeysetPaginator
+from property.search import search_flats
+from property.shards import get_shard, get_shard_aliases
+
+
+SORT_ORDERS = {
+    'price': ('price', 'pk'),
+    'date': ('-created_at', '-pk'),
+    'area': ('-living_area', '-pk'),
+    'relevance': ('-search_rank', 'pk'),
+}
+DEFAULT_SORT = 'price'
+SEARCH_SORT = 'relevance'
+
+# Параметр диапазона и поле квартиры; границы включаются.
+RANGE_FILTERS = {
+    'rooms': 'rooms_number',
+    'area': 'living_area',
+    'floor': 'floor_number',
+    'year': 'construction_year',
+}
+
+
+def parse_int(value):
+    """Целое из GET-параметра или None, если там не число."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_listing_params(query):
+    """Приводит GET-параметры поиска к каноническому виду.
+
+    Непустые значения, которые не удалось разобрать, трактуются так же,
+    как отсутствующие, поэтому ?min_price=abc и запрос без min_price
+    дают одинаковый набор параметров.
+    """
+    search_query = ' '.join((query.get('q') or '').split()) or None
+    sort = query.get('sort')
+    if sort not in SORT_ORDERS or (sort == SEARCH_SORT and not search_query):
+        sort = SEARCH_SORT if search_query else DEFAULT_SORT
+    params = {
+        'q': search_query,
+        'town': query.get('town') or None,
+        'min_price': parse_int(query.get('min_price')) or None,
+        'max_price': parse_int(query.get('max_price')) or None,
+        'new_building': query.get('new_building') == '1',
+        'sort': sort,
+    }
+    for name in RANGE_FILTERS:
+        for bound in (f'min_{name}', f'max_{name}'):
+            params[bound] = parse_int(query.get(bound)) or None
+    return params
+
+
+def filter_flats(params, flats=None, only_active=True):
+    if flats is None:
+        flats = Flat.objects.all()
+    if only_active:
+        # Литерал, а не параметр: так SQLite видит частичные индексы.
+        flats = flats.filter(active__exact_literal=True)
+    if params['town']:
+        flats = flats.filter(town=params['town'])
+    if params['min_price']:
+        flats = flats.filter(price__gt=params['min_price'])
+    if params['max_price']:
+        flats = flats.filter(price__lt=params['max_price'])
+    if params['new_building']:
+        flats = flats.filter(new_building=True)
+    for name, field in RANGE_FILTERS.items():
+        if params[f'min_{name}']:
+            flats = flats.filter(**{f'{field}__gte': params[f'min_{name}']})
+        if params[f'max_{name}']:
+            flats = flats.filter(**{f'{field}__lte': params[f'max_{name}']})
+    if params['q']:
+        flats = search_flats(flats, params['q'])
+    return flats
+
+
+def get_flats_paginator(flats, params, per_page):
+    """Выбирает, откуда читать страницу списка квартир.
+
+    Если квартиры разложены по шардам, запрос с городом идёт в один шард,
+    а запрос без города — во все, с слиянием результатов. Полнотекстовый
+    индекс есть только в основной базе, поэтому поиск читается оттуда.
+    """
+    ordering = SORT_ORDERS[params['sort']]
+    aliases = get_shard_aliases()
+    if not aliases or params['q']:
+        return KeysetPaginator(flats, ordering, per_page)
+    if params['town']:
+        return KeysetPaginator(
+            flats.using(get_shard(params['town'])), ordering, per_page
+        )
+    return MergedKeysetPaginator(
+        [flats.using(alias) for alias in aliases], ordering, per_page
+    )
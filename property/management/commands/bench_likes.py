@@ -0,0 +1,97 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from property.buffers import WriteBuffer
+from property.likes import apply_likes, set_like
+from property.models import Flat
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость лайков напрямую через M2M и через буфер '
+        'отложенной записи. Данные создаются в транзакции и откатываются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--flats', type=int, default=500)
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--buffer-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        results = {}
+        runs = [('M2M', self.run_direct), ('буфер', self.run_buffered)]
+        for name, run in runs:
+            try:
+                with transaction.atomic():
+                    operations = self.make_operations(options)
+                    started_at = time.perf_counter()
+                    run(operations, options)
+                    results[name] = time.perf_counter() - started_at
+                    raise Rollback
+            except Rollback:
+                pass
+
+        for name, elapsed in results.items():
+            self.stdout.write(
+                f'{name}: {options["operations"] / elapsed:.0f} лайков/с'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: {results["M2M"] / results["буфер"]:.1f}x'
+        ))
+
+    def make_operations(self, options):
+        User = get_user_model()
+        User.objects.bulk_create(
+            User(username=f'bench-likes-{index}')
+            for index in range(options['users'])
+        )
+        Flat.objects.bulk_create(
+            Flat(
+                price=index,
+                town='Бенчмарк',
+                address=f'ул. Тестовая д.{index}',
+                floor='1',
+                rooms_number=1,
+                active=True
+            )
+            for index in range(options['flats'])
+        )
+        user_ids = list(User.objects.filter(
+            username__startswith='bench-likes-'
+        ).values_list('pk', flat=True))
+        flat_ids = list(Flat.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:options['flats']])
+        return [
+            (
+                random.choice(user_ids),
+                random.choice(flat_ids),
+                random.random() < 0.8
+            )
+            for _ in range(options['operations'])
+        ]
+
+    def run_direct(self, operations, options):
+        for user_id, flat_id, liked in operations:
+            flat = Flat(pk=flat_id)
+            if liked:
+                flat.liked_by.add(user_id)
+            else:
+                flat.liked_by.remove(user_id)
+
+    def run_buffered(self, operations, options):
+        buffer = WriteBuffer(
+            apply_likes, max_size=options['buffer_size'], background=False
+        )
+        for user_id, flat_id, liked in operations:
+            set_like(user_id, flat_id, liked, buffer=buffer)
+        buffer.flush()
@@ -0,0 +1,80 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from property.models import Flat
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время рендера страницы со списком квартир без кеша '
+        'карточек, с холодным и с прогретым кешем'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10, 50, 100],
+            help='Сколько квартир выводить на странице'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз рендерить страницу для каждого замера'
+        )
+
+    def handle(self, *args, **options):
+        self.next_pk = 0
+        for size in options['sizes']:
+            uncached = self.measure(size, options['repeat'], timeout=0)
+            cold = self.measure(size, options['repeat'], warm=False)
+            warm = self.measure(size, options['repeat'], warm=True)
+            self.stdout.write(
+                f'{size} квартир: без кеша {uncached:.1f} мс, '
+                f'холодный кеш {cold:.1f} мс, прогретый {warm:.1f} мс '
+                f'({uncached / warm:.1f}x)'
+            )
+
+    def make_flats(self, size):
+        # Отрицательные id не пересекаются с настоящими карточками в кеше.
+        flats = [
+            Flat(
+                pk=-(self.next_pk + index + 1),
+                price=1000000 + index * 12345,
+                town='Бенчмарк',
+                address=f'ул. Тестовая д.{index}',
+                floor='1',
+                rooms_number=index % 5 + 1,
+                living_area=30 + index % 50,
+                construction_year=1960 + index % 60,
+                active=True
+            )
+            for index in range(size)
+        ]
+        self.next_pk += size
+        return flats
+
+    def render(self, flats, timeout):
+        render_to_string('flats_list.html', {
+            'flats': flats,
+            'card_cache_timeout': timeout,
+            'towns': [],
+        })
+
+    def measure(self, size, repeat, timeout=60, warm=False):
+        timings = []
+        flats = self.make_flats(size)
+        if warm:
+            self.render(flats, timeout)
+        for _ in range(repeat):
+            if not warm:
+                flats = self.make_flats(size)
+            started_at = time.perf_counter()
+            self.render(flats, timeout)
+            timings.append((time.perf_counter() - started_at) * 1000)
+        return statistics.median(timings)
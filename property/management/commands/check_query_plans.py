@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from property.plans import is_full_scan, iter_listing_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для запроса страницы списка квартир при всех '
+        'сочетаниях фильтров и сортировок и падает, если какой-то из них '
+        'читает таблицу квартир целиком'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='База, в которой смотреть планы, например шард flats_0'
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Печатать планы всех запросов'
+        )
+
+    def handle(self, *args, **options):
+        failures, checked = [], 0
+        with transaction.atomic(using=options['database']):
+            for name, plan in iter_listing_plans(options['database']):
+                checked += 1
+                if options['verbose_plans']:
+                    self.stdout.write(f'{name}\n{plan}\n')
+                if is_full_scan(plan):
+                    failures.append(f'{name}\n{plan}')
+
+        if failures:
+            raise CommandError(
+                'Полный просмотр таблицы квартир:\n\n' + '\n\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено планов: {checked}, полных просмотров таблицы нет'
+        ))
@@ -0,0 +1,57 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from property.export import EXPORT_FORMATS, iter_flats
+from property.listing import RANGE_FILTERS, filter_flats, parse_listing_params
+from property.routers import use_replica
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает квартиры с собственниками в CSV или NDJSON. '
+        'Фильтры те же, что на главной странице'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=EXPORT_FORMATS, default='csv'
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки, по умолчанию stdout'
+        )
+        parser.add_argument('--town')
+        parser.add_argument('--min-price')
+        parser.add_argument('--max-price')
+        parser.add_argument('--new-building', action='store_true')
+        parser.add_argument('--q', help='Полнотекстовый поиск')
+        for name in RANGE_FILTERS:
+            parser.add_argument(f'--min-{name}')
+            parser.add_argument(f'--max-{name}')
+
+    def handle(self, *args, **options):
+        params = parse_listing_params({
+            'town': options['town'],
+            'min_price': options['min_price'],
+            'max_price': options['max_price'],
+            'new_building': '1' if options['new_building'] else None,
+            'q': options['q'],
+            **{
+                bound: options[bound]
+                for name in RANGE_FILTERS
+                for bound in (f'min_{name}', f'max_{name}')
+            },
+        })
+        serialize, _ = EXPORT_FORMATS[options['format']]
+        lines = serialize(iter_flats(filter_flats(params, only_active=False)))
+
+        output = sys.stdout
+        if options['output']:
+            output = open(options['output'], 'w', encoding='utf-8', newline='')
+        try:
+            with use_replica():
+                for line in lines:
+                    output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from property.importer import READERS, get_reader, import_flats, open_stream
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает квартиры и собственников из CSV или JSONL. '
+        'Колонки — поля квартиры, а также owner и owner_phone'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или - для stdin')
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк записывать за один раз'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            read_rows = get_reader(options['path'], options['format'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        flats_total, owners_total, errors_total = 0, 0, 0
+        started_at = time.monotonic()
+        with open_stream(options['path']) as stream:
+            for flats, owners, errors in import_flats(
+                read_rows(stream), options['batch_size']
+            ):
+                flats_total += flats
+                owners_total += owners
+                errors_total += len(errors)
+                for line_number, message in errors:
+                    self.stderr.write(f'Запись {line_number}: {message}')
+                elapsed = time.monotonic() - started_at
+                self.stdout.write(
+                    f'Загружено квартир: {flats_total} '
+                    f'({flats_total / elapsed:.0f} строк/с)'
+                )
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {elapsed:.1f} с: квартир {flats_total}, '
+            f'новых собственников {owners_total}, ошибок {errors_total}, '
+            f'{flats_total / elapsed if elapsed else 0:.0f} строк/с'
+        ))
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import CharField, ExpressionWrapper, F
+
+from property.models import Owner
+from property.phones import get_executor, normalize_phone, normalize_phones
+
+
+class Command(BaseCommand):
+    help = 'Приводит телефоны собственников к формату E.164'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Сколько собственников обрабатывать и сохранять за раз'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Число процессов для разбора номеров, 0 — без пула'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать изменения, ничего не сохранять'
+        )
+
+    def handle(self, *args, **options):
+        executor = get_executor(options['workers'])
+        checked, changed = 0, 0
+        try:
+            for chunk in self.iter_chunks(options['chunk_size']):
+                raw_phones = normalize_phones(
+                    [raw_phone for _, raw_phone in chunk], executor
+                )
+                owners = []
+                for pk, raw_phone in chunk:
+                    new_phone = raw_phones.get(raw_phone)
+                    if (raw_phone or None) == new_phone:
+                        continue
+                    if options['dry_run']:
+                        self.stdout.write(f'{pk}: {raw_phone!r} -> {new_phone!r}')
+                    owners.append(Owner(pk=pk, pure_phone=new_phone))
+                if not options['dry_run']:
+                    with transaction.atomic():
+                        Owner.objects.bulk_update(owners, ['pure_phone'])
+                checked += len(chunk)
+                changed += len(owners)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        verb = 'Будет изменено' if options['dry_run'] else 'Изменено'
+        summary = f'Проверено собственников: {checked}. {verb}: {changed}.'
+        if executor is None:
+            summary += (
+                f' Попаданий в кеш разбора: {normalize_phone.cache_info().hits}'
+            )
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def iter_chunks(self, chunk_size):
+        owners = Owner.objects.annotate(
+            raw_phone=ExpressionWrapper(F('pure_phone'), output_field=CharField())
+        ).order_by('pk')
+        last_pk = 0
+        while True:
+            chunk = list(owners.filter(pk__gt=last_pk).values_list(
+                'pk', 'raw_phone'
+            )[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            yield chunk
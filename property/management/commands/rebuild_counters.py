@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from property import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики лайков, жалоб и квартир собственников'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = counters.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            'Пересчитаны лайки у квартир: {likes}, '
+            'жалобы у квартир: {complaints}, '
+            'квартиры у собственников: {owners}'.format(**updated)
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from property.search import index_flats
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс по описанию и адресу квартир'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Псевдоним базы данных'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic(using=options['database']):
+            index_flats(using=options['database'])
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
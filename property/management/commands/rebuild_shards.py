@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from property.shards import get_shard_aliases, rebuild_shards
+
+
+class Command(BaseCommand):
+    help = 'Заново раскладывает копии квартир по шардам из основной базы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Сколько квартир читать из основной базы за раз'
+        )
+
+    def handle(self, *args, **options):
+        if not get_shard_aliases():
+            raise CommandError('Шарды не настроены, см. FLAT_SHARDS')
+        copied = rebuild_shards(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Скопировано квартир: {copied}, шардов: {len(get_shard_aliases())}'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from property.towns import rebuild_towns
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает справочник городов и количество объявлений в них'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'towns',
+            nargs='*',
+            help='Пересчитать только эти города'
+        )
+
+    def handle(self, *args, **options):
+        towns_count = rebuild_towns(options['towns'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано городов: {towns_count}'
+        ))
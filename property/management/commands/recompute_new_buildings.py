@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from property.buildings import recompute_new_buildings
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает признак новостройки по году постройки '
+        'и NEW_BUILDING_YEAR'
+    )
+
+    def handle(self, *args, **options):
+        changed = recompute_new_buildings()
+        self.stdout.write(self.style.SUCCESS(
+            f'Новостройки с {settings.NEW_BUILDING_YEAR} года, '
+            f'исправлено квартир: {changed}'
+        ))
@@ -0,0 +1,52 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from property.cache import bump_listing_version
+from property.importer import (
+    READERS, get_reader, open_stream, reconcile_batch
+)
+from property.owners import OwnerReconciler
+
+
+class Command(BaseCommand):
+    help = (
+        'Связывает квартиры с собственниками из CSV или JSONL с колонками '
+        'flat_id, owner, owner_phone. Повторный запуск ничего не дублирует'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или - для stdin')
+        parser.add_argument('--format', choices=READERS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            read_rows = get_reader(options['path'], options['format'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        reconciler = OwnerReconciler()
+        owners_total, links_total, errors_total = 0, 0, 0
+        try:
+            with open_stream(options['path']) as stream:
+                rows = enumerate(read_rows(stream), start=1)
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    owners, links, errors = reconcile_batch(
+                        batch, reconciler
+                    )
+                    owners_total += owners
+                    links_total += links
+                    errors_total += len(errors)
+                    for line_number, message in errors:
+                        self.stderr.write(f'Запись {line_number}: {message}')
+        finally:
+            bump_listing_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Новых собственников: {owners_total}, '
+            f'новых связей: {links_total}, ошибок: {errors_total}'
+        ))
@@ -0,0 +1,73 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from property import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет главную страницу со всеми сочетаниями фильтров, поиск, '
+        'списки квартир и собственников в админке и нормализацию телефонов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз прогонять каждый сценарий'
+        )
+        parser.add_argument(
+            '--only',
+            help='Запустить только сценарии, в названии которых есть строка'
+        )
+        parser.add_argument(
+            '--report',
+            help='Куда сохранить отчёт в JSON'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Отчёт, с которым сравнить результаты'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Допустимое замедление p95 относительно базового отчёта'
+        )
+
+    def handle(self, *args, **options):
+        report = dict(
+            benchmarks.get_dataset(),
+            created_at=timezone.now().isoformat(),
+            repeat=options['repeat'],
+            cases={},
+        )
+        self.stdout.write(
+            f'Квартир: {report["flats"]}, собственников: {report["owners"]}'
+        )
+        for name, result in benchmarks.run(options['repeat'], options['only']):
+            report['cases'][name] = result
+            self.stdout.write(
+                f'{name}: {result["queries"]} запросов, '
+                f'p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс, '
+                f'память {result["peak_kb"]} КБ'
+            )
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+
+        if not options['baseline']:
+            return
+        with open(options['baseline'], encoding='utf-8') as baseline:
+            regressions = benchmarks.compare(
+                report, json.load(baseline), options['tolerance']
+            )
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from property.seed import seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими квартирами, собственниками, '
+        'лайками и жалобами для замеров производительности'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=10000,
+            help='Сколько квартир создать, например 10000, 100000 или 1000000'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Сколько квартир записывать в одной транзакции'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Зерно генератора, чтобы получать одинаковые данные'
+        )
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        batches = seed(options['size'], options['batch_size'], options['seed'])
+        for created in batches:
+            self.stdout.write(f'Создано квартир: {created}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started_at:.1f} с'
+        ))
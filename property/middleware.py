@@ -0,0 +1,95 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from property.instrumentation import RequestStats, set_current_stats
+from property.routers import is_replica_configured, pin_primary
+
+
+logger = logging.getLogger(__name__)
+
+
+PINNED_UNTIL_SESSION_KEY = 'primary_pinned_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaPinningMiddleware:
+    """Читает с основной базы в запросах с записью и некоторое время после.
+
+    После любого небезопасного запроса в сессию пишется время, до которого
+    пользователь читает с основной базы: так он сразу видит свои изменения,
+    даже если реплика отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_replica_configured():
+            return self.get_response(request)
+
+        now = time.time()
+        writes = request.method not in SAFE_METHODS
+        pinned_until = request.session.get(PINNED_UNTIL_SESSION_KEY, 0)
+        if not writes and pinned_until <= now:
+            return self.get_response(request)
+
+        with pin_primary():
+            response = self.get_response(request)
+        # Продлеваем окно не на каждый запрос, чтобы частые записи вроде
+        # лайков не сохраняли сессию каждый раз.
+        sticky_seconds = settings.REPLICA_STICKY_SECONDS
+        if writes and pinned_until - now < sticky_seconds / 2:
+            request.session[PINNED_UNTIL_SESSION_KEY] = now + sticky_seconds
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """Считает SQL-запросы, время в базе и в шаблонах для доли запросов.
+
+    Доля задаётся REQUEST_PROFILING_RATE, остальные запросы проходят
+    без накладных расходов. Результат уходит в заголовок Server-Timing,
+    медленные запросы и повторяющиеся SQL (N+1) пишутся в лог
+    с местом в коде, откуда они выполнялись.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_PROFILING_RATE:
+            return self.get_response(request)
+
+        stats = RequestStats(settings.N_PLUS_ONE_THRESHOLD)
+        set_current_stats(stats)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            set_current_stats(None)
+
+        response['Server-Timing'] = stats.get_server_timing()
+        self.log(request, stats)
+        return response
+
+    def log(self, request, stats):
+        total_ms = stats.total_time * 1000
+        if total_ms >= settings.SLOW_REQUEST_MS:
+            logger.warning(
+                'Медленный запрос %s %s: %.0f мс, SQL: %d за %.0f мс, '
+                'шаблоны: %.0f мс',
+                request.method, request.get_full_path(), total_ms,
+                stats.queries, stats.db_time * 1000,
+                stats.template_time * 1000
+            )
+        for shape, count, call_site in stats.get_repeated_queries():
+            logger.warning(
+                'Похоже на N+1 в %s %s: %d одинаковых запросов из %s: %s',
+                request.method, request.path, count, call_site, shape
+            )
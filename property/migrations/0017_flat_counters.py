@@ -0,0 +1,52 @@
+# Generated by Django 2.2.24 on 2026-10-18 10:59
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    counts = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Flat = apps.get_model('property', 'Flat')
+    Owner = apps.get_model('property', 'Owner')
+    Complaint = apps.get_model('property', 'Complaint')
+
+    Flat.objects.update(
+        likes_count=count_subquery(Flat.liked_by.through, 'flat_id'),
+        complaints_count=count_subquery(Complaint, 'flat_id'),
+    )
+    Owner.objects.update(
+        flats_count=count_subquery(Owner.flats.through, 'owner_id')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0016_auto_20250710_1321'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flat',
+            name='complaints_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Количество жалоб'),
+        ),
+        migrations.AddField(
+            model_name='flat',
+            name='likes_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Количество лайков'),
+        ),
+        migrations.AddField(
+            model_name='owner',
+            name='flats_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Количество квартир'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.24 on 2026-10-18 11:02
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_towns(apps, schema_editor):
+    Flat = apps.get_model('property', 'Flat')
+    Town = apps.get_model('property', 'Town')
+
+    rows = Flat.objects.exclude(town='').order_by().values('town').annotate(
+        total=Count('pk'),
+        active_total=Count('pk', filter=Q(active=True)),
+    )
+    Town.objects.bulk_create(
+        [
+            Town(
+                name=row['town'],
+                flats_count=row['total'],
+                active_flats_count=row['active_total'],
+            )
+            for row in rows
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0017_flat_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Town',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название города')),
+                ('flats_count', models.IntegerField(default=0, verbose_name='Количество объявлений')),
+                ('active_flats_count', models.IntegerField(default=0, verbose_name='Количество активных объявлений')),
+            ],
+            options={
+                'verbose_name': 'Город',
+                'verbose_name_plural': 'Города',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(fill_towns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from property import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_index_tables(schema_editor)
+    search.index_flats(using=schema_editor.connection.alias)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index_tables(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0018_town'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 2.2.24 on 2026-10-18 11:20
+
+from django.db import migrations, models
+from django.db.models import F, Max
+import django.utils.timezone
+import property.models
+
+
+def fill_flat_versions(apps, schema_editor):
+    Flat = apps.get_model('property', 'Flat')
+    Flat.objects.using(schema_editor.connection.alias).update(
+        updated_at=F('created_at'),
+        version=F('id'),
+    )
+
+
+def create_version_sequence(apps, schema_editor):
+    Flat = apps.get_model('property', 'Flat')
+    Sequence = apps.get_model('property', 'Sequence')
+    alias = schema_editor.connection.alias
+    last_id = Flat.objects.using(alias).aggregate(
+        last_id=Max('id')
+    )['last_id']
+    Sequence.objects.using(alias).create(
+        name='flat_version', value=last_id or 0
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0019_flat_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlatTombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flat_id', models.IntegerField(db_index=True, verbose_name='ID удалённой квартиры')),
+                ('version', models.BigIntegerField(unique=True, verbose_name='Версия')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Когда удалена')),
+            ],
+            options={
+                'verbose_name': 'Удалённая квартира',
+                'verbose_name_plural': 'Удалённые квартиры',
+            },
+        ),
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Последнее значение')),
+            ],
+            options={
+                'verbose_name': 'Счётчик',
+                'verbose_name_plural': 'Счётчики',
+            },
+        ),
+        migrations.AlterModelManagers(
+            name='flat',
+            managers=[
+                ('objects', property.models.FlatManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='flat',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Когда объявление изменено'),
+        ),
+        migrations.AddField(
+            model_name='flat',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, help_text='Растёт при каждом изменении квартиры', verbose_name='Версия'),
+        ),
+        migrations.RunPython(
+            fill_flat_versions,
+            migrations.RunPython.noop,
+            hints={'model_name': 'flat'}
+        ),
+        migrations.RunPython(
+            create_version_sequence,
+            migrations.RunPython.noop
+        ),
+    ]
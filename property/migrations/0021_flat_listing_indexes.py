@@ -0,0 +1,42 @@
+# Generated by Django 2.2.24 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0020_flat_versions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='flat',
+            name='active',
+            field=models.BooleanField(verbose_name='Активно-ли объявление'),
+        ),
+        migrations.AddIndex(
+            model_name='flat',
+            index=models.Index(condition=models.Q(active=True), fields=['price', 'id'], name='flat_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flat',
+            index=models.Index(condition=models.Q(active=True), fields=['created_at', 'id'], name='flat_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flat',
+            index=models.Index(condition=models.Q(active=True), fields=['town', 'price', 'id'], name='flat_active_town_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flat',
+            index=models.Index(condition=models.Q(active=True), fields=['town', 'created_at', 'id'], name='flat_active_town_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flat',
+            index=models.Index(condition=models.Q(active=True), fields=['new_building', 'price', 'id'], name='flat_active_new_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flat',
+            index=models.Index(condition=models.Q(active=True), fields=['new_building', 'created_at', 'id'], name='flat_active_new_created_idx'),
+        ),
+    ]
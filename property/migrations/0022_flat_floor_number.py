@@ -0,0 +1,61 @@
+# Generated by Django 2.2.24 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+from property.models import parse_floor
+
+
+CHUNK_SIZE = 1000
+
+
+def fill_floor_number(apps, schema_editor):
+    Flat = apps.get_model('property', 'Flat')
+    # Базовый менеджер: обычный update() не сдвигает версии квартир.
+    flats = Flat._base_manager.using(
+        schema_editor.connection.alias
+    ).order_by('pk').only('pk', 'floor')
+    last_pk = 0
+    while True:
+        chunk = list(flats.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        for flat in chunk:
+            flat.floor_number = parse_floor(flat.floor)
+        flats.bulk_update(
+            [flat for flat in chunk if flat.floor_number is not None],
+            ['floor_number']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0021_flat_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flat',
+            name='floor_number',
+            field=models.SmallIntegerField(blank=True, db_index=True, editable=False, help_text='Заполняется из поля «Этаж», если там число', null=True, verbose_name='Номер этажа'),
+        ),
+        migrations.RunPython(
+            fill_floor_number,
+            migrations.RunPython.noop,
+            hints={'model_name': 'flat'}
+        ),
+        migrations.AddIndex(
+            model_name='flat',
+            index=models.Index(condition=models.Q(active=True), fields=['living_area', 'id'], name='flat_active_area_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flat',
+            index=models.Index(condition=models.Q(active=True), fields=['town', 'living_area', 'id'], name='flat_active_town_area_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flat',
+            index=models.Index(condition=models.Q(active=True), fields=['new_building', 'living_area', 'id'], name='flat_active_new_area_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+# Сортировка по площади ставит квартиры без площади в конец. SQLite
+# при DESC и так ставит NULL последними и берёт обычные индексы
+# по площади, а PostgreSQL — первыми, и ему нужны индексы
+# с DESC NULLS LAST. Django 2.2 описать такие индексы не умеет.
+POSTGRES_INDEXES = {
+    'flat_active_area_nl_idx': '',
+    'flat_active_town_area_nl_idx': 'town, ',
+    'flat_active_new_area_nl_idx': 'new_building, ',
+}
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, prefix in POSTGRES_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX {name} ON property_flat '
+            f'({prefix}living_area DESC NULLS LAST, id DESC) WHERE active'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0022_flat_floor_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_indexes,
+            drop_indexes,
+            hints={'model_name': 'flat'}
+        ),
+    ]
@@ -1,11 +1,139 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.dispatch import Signal
 from phonenumber_field.modelfields import PhoneNumberField
 
+from property.cache import bump_listing_version
+
 
 User = get_user_model()
 
+FLAT_VERSION_SEQUENCE = 'flat_version'
+UNVERSIONED_FIELDS = {'likes_count', 'complaints_count'}
+
+# QuerySet.update() не шлёт post_save. Вместо него приходит этот сигнал
+# с версией, которую получили все изменённые квартиры.
+flats_updated = Signal(providing_args=['version', 'using'])
+
+
+@models.BooleanField.register_lookup
+class ExactLiteral(models.Lookup):
+    """Сравнение с литералом вместо параметра запроса.
+
+    SQLite выбирает частичный индекс с WHERE "active" = 1, только если
+    в запросе стоит то же значение литералом: про active = ? планировщик
+    не знает, подойдёт ли индекс. Литерал пишется так же, как Django
+    пишет условие индекса.
+    """
+    lookup_name = 'exact_literal'
+
+    def as_sql(self, compiler, connection):
+        lhs, params = self.process_lhs(compiler, connection)
+        literal = connection.schema_editor().quote_value(bool(self.rhs))
+        return f'{lhs} = {literal}', params
+
+
+def parse_floor(floor):
+    """Номер этажа из текстового поля floor, None — если это не число."""
+    try:
+        return int((floor or '').strip())
+    except ValueError:
+        return None
+
+
+def is_new_building(construction_year):
+    if construction_year is None:
+        return None
+    return construction_year >= settings.NEW_BUILDING_YEAR
+
+
+class FlatQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Как обычный update(), но ещё сдвигает updated_at и version.
+
+        Все строки одного вызова получают одну версию. Версия берётся
+        в той же транзакции, что и UPDATE: строка счётчика заблокирована
+        до записи квартир, и версии фиксируются по возрастанию.
+        Счётчики лайков и жалоб версию не меняют: объявление от них
+        не меняется. Если меняется год постройки, вместе с ним
+        пересчитывается new_building. После коммита сбрасывается кеш
+        списка, как после save(), а изменённые квартиры уходят в шарды
+        через сигнал flats_updated.
+        """
+        versioned = not set(kwargs) <= UNVERSIONED_FIELDS
+        with transaction.atomic(using=self.db):
+            if versioned:
+                kwargs.setdefault('updated_at', timezone.now())
+                if 'version' not in kwargs:
+                    kwargs['version'] = Sequence.next_value(
+                        FLAT_VERSION_SEQUENCE
+                    )
+            updated = self._update_versioned(**kwargs)
+            if updated and versioned:
+                transaction.on_commit(bump_listing_version, using=self.db)
+                flats_updated.send(
+                    sender=self.model, version=kwargs['version'], using=self.db
+                )
+        return updated
+
+    def _update_versioned(self, **kwargs):
+        if 'floor' in kwargs and 'floor_number' not in kwargs:
+            if not hasattr(kwargs['floor'], 'resolve_expression'):
+                kwargs['floor_number'] = parse_floor(kwargs['floor'])
+        year = kwargs.get('construction_year')
+        if 'new_building' in kwargs or year is None:
+            return super().update(**kwargs)
+        if not hasattr(year, 'resolve_expression'):
+            kwargs['new_building'] = is_new_building(year)
+            return super().update(**kwargs)
+
+        # Год задан выражением, его значение известно только после UPDATE.
+        flat_ids = list(self.values_list('pk', flat=True))
+        updated = super().update(**kwargs)
+        self.model.objects.using(self.db).filter(
+            pk__in=flat_ids
+        ).recompute_new_building()
+        return updated
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.floor_number = parse_floor(obj.floor)
+            if obj.construction_year is not None:
+                obj.new_building = is_new_building(obj.construction_year)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def recompute_new_building(self):
+        """Приводит new_building в соответствие с construction_year.
+
+        Два UPDATE на всю выборку вместо сохранения по одной квартире;
+        строки, где флаг уже верный, не трогаются и версию не меняют.
+        Возвращает id изменённых квартир.
+        """
+        year = settings.NEW_BUILDING_YEAR
+        changed = []
+        with transaction.atomic(using=self.db):
+            for flag, lookup in [
+                (True, 'construction_year__gte'),
+                (False, 'construction_year__lt'),
+            ]:
+                stale = self.filter(**{lookup: year}).exclude(
+                    new_building=flag
+                )
+                flat_ids = list(stale.values_list('pk', flat=True))
+                if flat_ids:
+                    self.model.objects.using(self.db).filter(
+                        pk__in=flat_ids
+                    ).update(new_building=flag)
+                changed.extend(flat_ids)
+        return changed
+
+
+class FlatManager(models.Manager.from_queryset(FlatQuerySet)):
+    use_in_migrations = True
 
 
 class Flat(models.Model):
@@ -14,6 +142,19 @@ class Flat(models.Model):
         default=timezone.now,
         db_index=True
     )
+    updated_at = models.DateTimeField(
+        'Когда объявление изменено',
+        default=timezone.now,
+        db_index=True,
+        editable=False
+    )
+    version = models.BigIntegerField(
+        'Версия',
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text='Растёт при каждом изменении квартиры'
+    )
     description = models.TextField('Текст объявления', blank=True)
     price = models.IntegerField('Цена квартиры', db_index=True)
     town = models.CharField(
@@ -36,6 +177,14 @@ class Flat(models.Model):
         max_length=3,
         help_text='Первый этаж, последний этаж, пятый этаж'
     )
+    floor_number = models.SmallIntegerField(
+        'Номер этажа',
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text='Заполняется из поля «Этаж», если там число'
+    )
     rooms_number = models.IntegerField(
         'Количество комнат в квартире',
         db_index=True
@@ -47,7 +196,7 @@ class Flat(models.Model):
         db_index=True
     )
     has_balcony = models.NullBooleanField('Наличие балкона', db_index=True)
-    active = models.BooleanField('Активно-ли объявление', db_index=True)
+    active = models.BooleanField('Активно-ли объявление')
     construction_year = models.IntegerField(
         'Год постройки здания',
         null=True,
@@ -73,17 +222,101 @@ class Flat(models.Model):
         verbose_name='Кто лайкнул',
         blank=True
     )
+    likes_count = models.PositiveIntegerField(
+        'Количество лайков',
+        default=0,
+        db_index=True,
+        editable=False
+    )
+    complaints_count = models.PositiveIntegerField(
+        'Количество жалоб',
+        default=0,
+        db_index=True,
+        editable=False
+    )
+
+    objects = FlatManager()
+
     def __str__(self):
         return f'{self.town}, {self.address} ({self.price}р.)'
 
-    def save(self, *args, **kwargs):
+    def update_new_building(self):
         if self.construction_year is not None:
-            self.new_building = self.construction_year >= 2015
-        super().save(*args, **kwargs)
+            self.new_building = is_new_building(self.construction_year)
+
+    def save(self, *args, **kwargs):
+        self.update_new_building()
+        self.floor_number = parse_floor(self.floor)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'floor' in update_fields:
+            update_fields = kwargs['update_fields'] = {
+                *update_fields, 'floor_number'
+            }
+        if update_fields is not None and set(update_fields) <= UNVERSIONED_FIELDS:
+            super().save(*args, **kwargs)
+            return
+        # Версия и запись квартиры в одной транзакции, см. update().
+        with transaction.atomic(using=kwargs.get('using')):
+            self.updated_at = timezone.now()
+            self.version = Sequence.next_value(FLAT_VERSION_SEQUENCE)
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'updated_at', 'version'
+                }
+            super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = 'Квартира'
         verbose_name_plural = 'Квартиры'
+        # Под фильтры и сортировки главной страницы: в списке только
+        # активные объявления, поэтому индексы частичные.
+        indexes = [
+            models.Index(
+                fields=['price', 'id'],
+                name='flat_active_price_idx',
+                condition=models.Q(active=True)
+            ),
+            models.Index(
+                fields=['created_at', 'id'],
+                name='flat_active_created_idx',
+                condition=models.Q(active=True)
+            ),
+            models.Index(
+                fields=['living_area', 'id'],
+                name='flat_active_area_idx',
+                condition=models.Q(active=True)
+            ),
+            models.Index(
+                fields=['town', 'price', 'id'],
+                name='flat_active_town_price_idx',
+                condition=models.Q(active=True)
+            ),
+            models.Index(
+                fields=['town', 'created_at', 'id'],
+                name='flat_active_town_created_idx',
+                condition=models.Q(active=True)
+            ),
+            models.Index(
+                fields=['town', 'living_area', 'id'],
+                name='flat_active_town_area_idx',
+                condition=models.Q(active=True)
+            ),
+            models.Index(
+                fields=['new_building', 'price', 'id'],
+                name='flat_active_new_price_idx',
+                condition=models.Q(active=True)
+            ),
+            models.Index(
+                fields=['new_building', 'created_at', 'id'],
+                name='flat_active_new_created_idx',
+                condition=models.Q(active=True)
+            ),
+            models.Index(
+                fields=['new_building', 'living_area', 'id'],
+                name='flat_active_new_area_idx',
+                condition=models.Q(active=True)
+            ),
+        ]
 
 
 
@@ -134,10 +367,78 @@ class Owner(models.Model):
         related_name='owners',
         verbose_name='Квартиры в собственности'
     )
+    flats_count = models.PositiveIntegerField(
+        'Количество квартир',
+        default=0,
+        db_index=True,
+        editable=False
+    )
 
     def __str__(self):
         return self.full_name
 
     class Meta:
         verbose_name = 'Собственник'
-        verbose_name_plural = 'Собственники'
\ No newline at end of file
+        verbose_name_plural = 'Собственники'
+
+
+
+
+class Town(models.Model):
+    name = models.CharField('Название города', max_length=50, unique=True)
+    flats_count = models.IntegerField('Количество объявлений', default=0)
+    active_flats_count = models.IntegerField(
+        'Количество активных объявлений',
+        default=0
+    )
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Город'
+        verbose_name_plural = 'Города'
+        ordering = ['name']
+
+
+
+
+class FlatTombstone(models.Model):
+    flat_id = models.IntegerField('ID удалённой квартиры', db_index=True)
+    version = models.BigIntegerField('Версия', unique=True)
+    deleted_at = models.DateTimeField('Когда удалена', default=timezone.now)
+
+    def __str__(self):
+        return f'Квартира {self.flat_id} удалена'
+
+    class Meta:
+        verbose_name = 'Удалённая квартира'
+        verbose_name_plural = 'Удалённые квартиры'
+
+
+
+
+class Sequence(models.Model):
+    name = models.CharField('Название', max_length=50, unique=True)
+    value = models.BigIntegerField('Последнее значение', default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+    @classmethod
+    def next_value(cls, name):
+        """Возвращает следующее значение счётчика.
+
+        Строка счётчика блокируется до конца внешней транзакции, поэтому
+        версии фиксируются в базе в порядке возрастания.
+        """
+        with transaction.atomic():
+            counters = cls.objects.filter(name=name)
+            if not counters.update(value=F('value') + 1):
+                cls.objects.get_or_create(name=name)
+                counters.update(value=F('value') + 1)
+            return counters.values_list('value', flat=True).get()
+
+    class Meta:
+        verbose_name = 'Счётчик'
+        verbose_name_plural = 'Счётчики'
@@ -0,0 +1,85 @@
+from django.db import transaction
+
+from property import counters
+from property.bulk import insert_returning_pks
+from property.models import Owner
+from property.phones import normalize_phone
+
+
+def normalize_full_name(full_name):
+    return ' '.join(str(full_name or '').split())
+
+
+def get_owner_key(full_name, phone):
+    """Ключ дедупликации: ФИО без учёта регистра и пробелов + номер E.164."""
+    return (
+        normalize_full_name(full_name).casefold(),
+        normalize_phone(str(phone)) if phone else None,
+    )
+
+
+class OwnerReconciler:
+    """Связывает квартиры с собственниками, не создавая дублей.
+
+    Все существующие собственники один раз загружаются в словарь
+    {ключ: pk}, дальше недостающие собственники и связи вычисляются
+    как разность множеств и пишутся пачками. На пачку уходит
+    постоянное число запросов, независимо от её размера.
+    """
+
+    def __init__(self):
+        self.owner_pks = {}
+        owners = Owner.objects.order_by('pk').values_list(
+            'pk', 'full_name', 'pure_phone'
+        )
+        for pk, full_name, phone in owners.iterator():
+            self.owner_pks.setdefault(get_owner_key(full_name, phone), pk)
+
+    def reconcile(self, records):
+        """records — тройки (id квартиры, ФИО, телефон в любом формате).
+
+        Возвращает число созданных собственников и связей. Новые
+        собственники попадают в индекс только после коммита транзакции:
+        при откате их pk в базе не останется.
+        """
+        full_names, links = {}, []
+        for flat_id, full_name, phone in records:
+            full_name = normalize_full_name(full_name)
+            if not full_name:
+                continue
+            key = get_owner_key(full_name, phone)
+            full_names.setdefault(key, full_name)
+            links.append((flat_id, key))
+        if not links:
+            return 0, 0
+
+        with transaction.atomic():
+            new_owners = {
+                key: Owner(full_name=full_name, pure_phone=key[1])
+                for key, full_name in full_names.items()
+                if key not in self.owner_pks
+            }
+            insert_returning_pks(Owner, list(new_owners.values()))
+            new_pks = {key: owner.pk for key, owner in new_owners.items()}
+            transaction.on_commit(lambda: self.owner_pks.update(new_pks))
+
+            wanted = {
+                (new_pks.get(key) or self.owner_pks[key], flat_id)
+                for flat_id, key in links
+            }
+            Through = Owner.flats.through
+            existing = set(Through.objects.filter(
+                flat_id__in={flat_id for flat_id, _ in links}
+            ).values_list('owner_id', 'flat_id'))
+            missing = wanted - existing
+            Through.objects.bulk_create(
+                [
+                    Through(owner_id=owner_id, flat_id=flat_id)
+                    for owner_id, flat_id in missing
+                ],
+                ignore_conflicts=True
+            )
+            counters.refresh_flats_count(
+                {owner_id for owner_id, _ in missing}
+            )
+        return len(new_owners), len(missing)
@@ -0,0 +1,270 @@
+import base64
+import binascii
+import heapq
+import json
+from functools import cmp_to_key, partial
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Max, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+class KeysetPaginator:
+    """Постраничный вывод по ключу: WHERE (price, id) > (…) вместо OFFSET.
+
+    ordering — поля сортировки в формате order_by, последним должно идти
+    уникальное поле (обычно pk), иначе порядок страниц не детерминирован.
+    Кроме полей модели можно сортировать по числовым аннотациям.
+    Пустые значения полей с null=True идут в конце, в каком бы
+    направлении ни шла сортировка.
+    """
+
+    def __init__(self, queryset, ordering, per_page=10):
+        self.queryset = queryset
+        self.ordering = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        direction, values = 'next', None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+
+        backwards = direction == 'prev'
+        rows = self.fetch(backwards, values)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows)
+        has_next = has_more if not backwards else True
+        has_prev = values is not None if not backwards else has_more
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor('next', rows[-1]) if has_next else None,
+            prev_cursor=self.encode_cursor('prev', rows[0]) if has_prev else None,
+        )
+
+    def fetch(self, backwards, values):
+        queryset = self.filter(self.queryset, backwards, values)
+        return list(queryset[:self.per_page + 1])
+
+    def filter(self, queryset, backwards, values):
+        queryset = queryset.order_by(*self._order_by(backwards, queryset.db))
+        if values is not None:
+            queryset = queryset.filter(self._after(values, backwards))
+        return queryset
+
+    def encode_cursor(self, direction, obj):
+        values = []
+        for name, _ in self.ordering:
+            field = self._field(name)
+            if field is None or getattr(obj, name) is None:
+                values.append(getattr(obj, name))
+            else:
+                values.append(field.value_to_string(obj))
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(cursor + padding)
+            direction, values = json.loads(raw.decode())
+            if direction not in ('next', 'prev'):
+                raise ValueError
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return direction, [
+                self._to_python(name, value)
+                for (name, _), value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise InvalidCursor(cursor)
+
+    def _field(self, name):
+        meta = self.queryset.model._meta
+        if name == 'pk':
+            return meta.pk
+        try:
+            return meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def _nullable(self, name):
+        field = self._field(name)
+        return field is not None and field.null
+
+    def _to_python(self, name, value):
+        field = self._field(name)
+        if value is None and self._nullable(name):
+            return None
+        if field is not None:
+            return field.to_python(value)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(value)
+        return value
+
+    def _order_by(self, backwards, using):
+        # SQLite и MySQL ставят NULL раньше всех значений, PostgreSQL —
+        # позже. Если база и так ставит NULL куда нужно, порядок остаётся
+        # простым, и под него подходят обычные индексы.
+        nulls_largest = connections[using].vendor in ('postgresql', 'oracle')
+        order_by = []
+        for name, descending in self.ordering:
+            reverse = descending != backwards
+            nulls_last = not backwards
+            if not self._nullable(name) or nulls_last == (reverse != nulls_largest):
+                order_by.append(('-' if reverse else '') + name)
+                continue
+            nulls = {'nulls_last': True} if nulls_last else {'nulls_first': True}
+            field = F(name)
+            order_by.append(field.desc(**nulls) if reverse else field.asc(**nulls))
+        return order_by
+
+    def _after(self, values, backwards):
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            if value is None:
+                # Дальше NULL идут только NULL, а при обходе назад — все
+                # непустые значения.
+                further = Q(**{f'{name}__isnull': False}) if backwards else None
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                further = Q(**{f'{name}__{lookup}': value})
+                if self._nullable(name) and not backwards:
+                    further |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            if further is not None:
+                condition |= equal & further
+            equal &= same
+        return condition
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """Тот же постраничный вывод, но по нескольким querysets сразу.
+
+    Нужен, когда одна таблица разложена по нескольким базам: из каждой
+    берётся не больше per_page + 1 строк, списки сливаются через
+    heapq.merge в общем порядке сортировки. Курсоры совместимы
+    с KeysetPaginator.
+    """
+
+    def __init__(self, querysets, ordering, per_page=10):
+        super().__init__(querysets[0], ordering, per_page)
+        self.querysets = querysets
+
+    def fetch(self, backwards, values):
+        results = [
+            list(self.filter(queryset, backwards, values)[:self.per_page + 1])
+            for queryset in self.querysets
+        ]
+        key = cmp_to_key(partial(self._compare, backwards))
+        merged = heapq.merge(*results, key=key)
+        return list(islice(merged, self.per_page + 1))
+
+    def _compare(self, backwards, first, second):
+        for name, descending in self.ordering:
+            first_value = getattr(first, name)
+            second_value = getattr(second, name)
+            if first_value == second_value:
+                continue
+            if first_value is None or second_value is None:
+                # NULL в конце прямого порядка и в начале обратного.
+                later = first_value is None
+                return -1 if later == backwards else 1
+            less = first_value < second_value
+            if descending != backwards:
+                less = not less
+            return -1 if less else 1
+        return 0
+
+
+def estimate_count(queryset):
+    """Оценка числа строк без их подсчёта или None, если оценки нет.
+
+    PostgreSQL отдаёт оценку планировщика из EXPLAIN. У SQLite оценок
+    по произвольному запросу нет; для таблицы целиком годится
+    статистика ANALYZE из sqlite_stat1, а если её не собирали —
+    наибольший id.
+    """
+    connection = connections[queryset.db]
+    query = queryset.order_by().values('pk')
+    if connection.vendor == 'postgresql':
+        sql, params = query.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if connection.vendor == 'sqlite' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            row = None
+            if cursor.fetchone() is not None:
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+        if row:
+            return int(row[0].split()[0])
+        return query.aggregate(last_pk=Max('pk'))['last_pk']
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который не считает COUNT(*) по всей большой таблице.
+
+    Строки считаются точно, но не дальше ADMIN_EXACT_COUNT_LIMIT: запрос
+    с LIMIT стоит одинаково на любой таблице. Если строк больше, берётся
+    оценка из estimate_count, но не меньше уже посчитанного. Если оценки
+    нет, строки считаются точно: иначе по списку нельзя дойти дальше
+    ADMIN_EXACT_COUNT_LIMIT строк.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        capped = self.object_list.order_by().values('pk')[:limit + 1].count()
+        if capped <= limit:
+            return capped
+        estimate = estimate_count(self.object_list)
+        if estimate is None:
+            return self.object_list.count()
+        return max(estimate, capped)
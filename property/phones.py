@@ -0,0 +1,78 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from phonenumbers import (
+    NumberParseException, PhoneNumberFormat, format_number, is_valid_number,
+    parse
+)
+
+
+DEFAULT_REGION = 'RU'
+RUSSIAN_COUNTRY_CODE = 7
+
+INVALID_PATTERNS = [
+    re.compile(pattern) for pattern in [
+        r'^0+$',
+        r'^123456',
+        r'(\d)\1{5}',
+        r'^555555',
+        r'^999999',
+    ]
+]
+
+
+def is_definitely_invalid(phone_str):
+    """Определяет заведомо невалидные номера по шаблонам"""
+    if not phone_str:
+        return True
+
+    clean_phone = re.sub(r'[^0-9]', '', str(phone_str))
+    return any(pattern.search(clean_phone) for pattern in INVALID_PATTERNS)
+
+
+@lru_cache(maxsize=100000)
+def normalize_phone(raw_phone, region=DEFAULT_REGION):
+    """Возвращает российский номер в формате E.164 или None.
+
+    Результат кешируется: в реальных данных одни и те же номера
+    повторяются у многих собственников и квартир.
+    """
+    if not raw_phone or is_definitely_invalid(raw_phone):
+        return None
+    try:
+        parsed = parse(str(raw_phone), region)
+    except (NumberParseException, ValueError):
+        return None
+    if not is_valid_number(parsed):
+        return None
+    if parsed.country_code != RUSSIAN_COUNTRY_CODE:
+        return None
+    if str(parsed.national_number).startswith('0'):
+        return None
+    return format_number(parsed, PhoneNumberFormat.E164)
+
+
+def normalize_phones(raw_phones, executor=None):
+    """Нормализует набор номеров, каждый уникальный — один раз.
+
+    Возвращает словарь {исходная строка: номер в E.164 или None}.
+    Если передан executor (например, ProcessPoolExecutor), разбор
+    номеров распределяется по процессам.
+    """
+    unique_phones = [phone for phone in set(raw_phones) if phone]
+    if executor is None:
+        normalized = map(normalize_phone, unique_phones)
+    else:
+        normalized = executor.map(
+            normalize_phone,
+            unique_phones,
+            chunksize=max(len(unique_phones) // 32, 1)
+        )
+    return dict(zip(unique_phones, normalized))
+
+
+def get_executor(workers):
+    if not workers or workers < 2:
+        return None
+    return ProcessPoolExecutor(max_workers=workers)
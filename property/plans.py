@@ -0,0 +1,128 @@
+import itertools
+import json
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from property.listing import (
+    SORT_ORDERS, filter_flats, parse_listing_params
+)
+from property.models import Flat
+from property.pagination import KeysetPaginator
+
+
+# Поиск по индексу только с условием active — тот же полный просмотр:
+# активны почти все объявления.
+FULL_SCAN_RE = re.compile(
+    r'\bSCAN (TABLE )?property_flat\b(?! USING)'
+    r'|\bSEARCH (TABLE )?property_flat USING (COVERING )?INDEX \S+ \(active=\?\)'
+    r'|Seq Scan on property_flat\b'
+)
+# Обход индекса целиком в SQLite допустим, только если он сразу даёт
+# нужный порядок и чтение обрывается на LIMIT.
+INDEX_SCAN_RE = re.compile(r'\bSCAN (TABLE )?property_flat USING\b')
+SORT_RE = re.compile(r'\bUSE TEMP B-TREE FOR ORDER BY\b')
+
+FILTER_VALUES = {
+    'town': [None, 'Москва'],
+    'min_price': [None, '3000000'],
+    'max_price': [None, '8000000'],
+    'new_building': [None, '1'],
+    'min_rooms': [None, '2'],
+    'max_area': [None, '60'],
+    'min_floor': [None, '2'],
+    'min_year': [None, '2000'],
+    'sort': list(SORT_ORDERS),
+    'q': [None, 'балкон'],
+}
+
+# Значения ключа курсора для второй страницы.
+CURSOR_VALUES = {
+    'price': 5000000,
+    'created_at': timezone.now(),
+    'living_area': 40,
+    'pk': 100,
+    'search_rank': 0.5,
+}
+
+
+def iter_listing_params():
+    """Все сочетания фильтров главной страницы без повторов."""
+    seen = set()
+    for values in itertools.product(*FILTER_VALUES.values()):
+        query = {
+            name: value
+            for name, value in zip(FILTER_VALUES, values)
+            if value is not None
+        }
+        params = parse_listing_params(query)
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            yield params
+
+
+def is_full_scan(plan):
+    return bool(
+        FULL_SCAN_RE.search(plan)
+        or (INDEX_SCAN_RE.search(plan) and SORT_RE.search(plan))
+    )
+
+
+def describe(params, page):
+    filters = ', '.join(
+        f'{name}={value}' for name, value in sorted(params.items())
+        if value
+    )
+    return f'{filters}, {page}'
+
+
+def get_page_querysets(params, using=DEFAULT_DB_ALIAS):
+    """Запросы первой, следующей и предыдущей страницы списка."""
+    flats = filter_flats(params, Flat.objects.using(using))
+    ordering = SORT_ORDERS[params['sort']]
+    paginator = KeysetPaginator(flats, ordering)
+    names = [name.lstrip('-') for name in ordering]
+    values = [CURSOR_VALUES[name] for name in names]
+    pages = [
+        ('первая страница', False, None),
+        ('следующая страница', False, values),
+        ('предыдущая страница', True, values),
+    ]
+    if 'living_area' in names:
+        # Квартиры без площади идут в конце сортировки по площади.
+        null_values = [
+            None if name == 'living_area' else value
+            for name, value in zip(names, values)
+        ]
+        pages += [
+            ('следующая страница без площади', False, null_values),
+            ('предыдущая страница без площади', True, null_values),
+        ]
+    for page, backwards, cursor_values in pages:
+        queryset = paginator.filter(flats, backwards, cursor_values)
+        yield (
+            describe(params, page),
+            queryset[:paginator.per_page + 1],
+        )
+
+
+def iter_listing_plans(using=DEFAULT_DB_ALIAS):
+    """Пары (описание, план) для всех запросов страниц главной.
+
+    Вызывать внутри транзакции: в PostgreSQL на её время отключается
+    Seq Scan.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        # На маленькой таблице PostgreSQL выберет Seq Scan даже при
+        # подходящем индексе; здесь важно, есть ли такой индекс.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    for params in iter_listing_params():
+        if params['q'] and using != DEFAULT_DB_ALIAS:
+            # Поиск всегда читается из основной базы.
+            continue
+        for name, queryset in get_page_querysets(params, using):
+            yield name, queryset.explain()
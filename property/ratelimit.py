@@ -0,0 +1,33 @@
+import time
+
+from django.core.cache import cache
+
+
+class TokenBucket:
+    """Ограничитель частоты в кеше: capacity токенов, rate токенов в секунду.
+
+    Чтение и запись состояния не атомарны, поэтому при гонке запрос может
+    проскочить сверх лимита — для защиты от всплесков этого достаточно.
+    """
+
+    def __init__(self, key, rate, capacity):
+        self.key = f'property:ratelimit:{key}'
+        self.rate = rate
+        self.capacity = capacity
+
+    def consume(self, tokens=1):
+        now = time.time()
+        state = cache.get(self.key)
+        if state is None:
+            available = self.capacity
+        else:
+            available, updated_at = state
+            available = min(
+                self.capacity, available + (now - updated_at) * self.rate
+            )
+        allowed = available >= tokens
+        if allowed:
+            available -= tokens
+        timeout = int((self.capacity - available) / self.rate) + 1
+        cache.set(self.key, (available, now), timeout)
+        return allowed
@@ -0,0 +1,111 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA_ALIAS = 'replica'
+
+_state = threading.local()
+
+
+def is_replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Внутри блока чтение идёт с реплики, если она настроена."""
+    previous = getattr(_state, 'use_replica', False)
+    _state.use_replica = True
+    try:
+        yield
+    finally:
+        _state.use_replica = previous
+
+
+@contextmanager
+def pin_primary():
+    """Внутри блока всё читается с основной базы, даже под use_replica."""
+    previous = getattr(_state, 'pinned', False)
+    _state.pinned = True
+    try:
+        yield
+    finally:
+        _state.pinned = previous
+
+
+def read_from_replica(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with use_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def iter_from_replica(iterable):
+    """Для StreamingHttpResponse: данные читаются уже после выхода из view."""
+    with use_replica():
+        yield from iterable
+
+
+class PrimaryReplicaRouter:
+    """Отправляет чтение на реплику только там, где это разрешено явно.
+
+    Всё остальное — запись, чтение вне use_replica, чтение внутри
+    транзакции и после недавней записи (pin_primary) — идёт в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'use_replica', False):
+            return None
+        if getattr(_state, 'pinned', False):
+            return DEFAULT_DB_ALIAS
+        if not is_replica_configured():
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+        return obj1._state.db in aliases and obj2._state.db in aliases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплику приносит репликация, а не migrate.
+        return db != REPLICA_ALIAS
+
+
+class FlatShardRouter:
+    """Обслуживает базы с копиями квартир, разложенными по городам.
+
+    В шардах есть только таблица квартир; всё остальное, в том числе
+    связанные с квартирой из шарда объекты, читается из основной базы.
+    Запись копий идёт явным .using() из property.shards.
+    """
+
+    def _is_shard(self, db):
+        return db in settings.FLAT_SHARDS
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is None or not self._is_shard(instance._state.db):
+            return None
+        if model._meta.label == 'property.Flat':
+            return instance._state.db
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._is_shard(obj1._state.db) or self._is_shard(obj2._state.db):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not self._is_shard(db):
+            return None
+        return app_label == 'property' and model_name == 'flat'
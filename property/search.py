@@ -0,0 +1,152 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+SQLITE_TABLE = 'property_flat_fts'
+POSTGRES_TABLE = 'property_flat_search'
+POSTGRES_CONFIG = 'russian'
+
+SQLITE_CREATE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+    "description, address, tokenize='unicode61 remove_diacritics 2')",
+]
+SQLITE_DROP = [f'DROP TABLE IF EXISTS {SQLITE_TABLE}']
+
+POSTGRES_CREATE = [
+    f'CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ('
+    'flat_id integer PRIMARY KEY '
+    'REFERENCES property_flat (id) ON DELETE CASCADE, '
+    'document tsvector NOT NULL)',
+    f'CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_gin '
+    f'ON {POSTGRES_TABLE} USING gin (document)',
+]
+POSTGRES_DROP = [f'DROP TABLE IF EXISTS {POSTGRES_TABLE}']
+
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector(%s, coalesce(address, '')), 'A') || "
+    "setweight(to_tsvector(%s, coalesce(description, '')), 'B')"
+)
+
+
+def create_index_tables(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {
+        'sqlite': SQLITE_CREATE,
+        'postgresql': POSTGRES_CREATE,
+    }.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_index_tables(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {
+        'sqlite': SQLITE_DROP,
+        'postgresql': POSTGRES_DROP,
+    }.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def index_flats(flat_ids=None, using=DEFAULT_DB_ALIAS):
+    """Обновляет поисковый индекс для квартир. None — переиндексировать все."""
+    connection = connections[using]
+    vendor = connection.vendor
+    where, index_where, params = '', '', []
+    if flat_ids is not None:
+        params = list(flat_ids)
+        if not params:
+            return
+        placeholders = ', '.join(['%s'] * len(params))
+        where = f'WHERE id IN ({placeholders})'
+        index_where = f'WHERE rowid IN ({placeholders})'
+
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(
+                f'DELETE FROM {SQLITE_TABLE} {index_where}',
+                params
+            )
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, description, address) '
+                f'SELECT id, description, address FROM property_flat {where}',
+                params
+            )
+        elif vendor == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (flat_id, document) '
+                f'SELECT id, {POSTGRES_DOCUMENT} FROM property_flat {where} '
+                'ON CONFLICT (flat_id) DO UPDATE '
+                'SET document = EXCLUDED.document',
+                [POSTGRES_CONFIG, POSTGRES_CONFIG] + params
+            )
+
+
+def unindex_flat(flat_id, using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(
+                f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [flat_id]
+            )
+        elif vendor == 'postgresql':
+            cursor.execute(
+                f'DELETE FROM {POSTGRES_TABLE} WHERE flat_id = %s', [flat_id]
+            )
+
+
+def get_search_terms(query):
+    return re.findall(r'\w+', query or '')
+
+
+def search_flats(flats, query):
+    """Оставляет квартиры, подходящие под запрос, и добавляет search_rank.
+
+    Чем выше search_rank, тем лучше совпадение. Таблица индекса
+    присоединяется к квартирам один раз, и ранг считается по той же
+    строке индекса, что нашла совпадение.
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return flats.none().annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    vendor = connections[flats.db].vendor
+    table = flats.model._meta.db_table
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return flats.extra(
+            tables=[SQLITE_TABLE],
+            where=[
+                f'{SQLITE_TABLE}.rowid = "{table}"."id"',
+                f'{SQLITE_TABLE} MATCH %s',
+            ],
+            params=[match]
+        ).annotate(search_rank=RawSQL(
+            f'-{SQLITE_TABLE}.rank', [], output_field=FloatField()
+        ))
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return flats.extra(
+            tables=[POSTGRES_TABLE],
+            where=[
+                f'{POSTGRES_TABLE}.flat_id = "{table}"."id"',
+                f'{POSTGRES_TABLE}.document @@ to_tsquery(%s, %s)',
+            ],
+            params=[POSTGRES_CONFIG, tsquery]
+        ).annotate(search_rank=RawSQL(
+            f'ts_rank({POSTGRES_TABLE}.document, to_tsquery(%s, %s))',
+            [POSTGRES_CONFIG, tsquery],
+            output_field=FloatField()
+        ))
+
+    for term in terms:
+        flats = flats.filter(
+            Q(description__icontains=term) | Q(address__icontains=term)
+        )
+    return flats.annotate(search_rank=Value(0.0, output_field=FloatField()))
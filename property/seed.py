@@ -0,0 +1,203 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from property import counters, search, shards, towns
+from property.bulk import insert_returning_pks
+from property.cache import bump_listing_version
+from property.models import (
+    FLAT_VERSION_SEQUENCE, Complaint, Flat, Owner, Sequence
+)
+
+
+USERNAME_PREFIX = 'bench-'
+
+# Город, вес в выборке, цена квадратного метра.
+TOWNS = [
+    ('Москва', 30, 280000),
+    ('Санкт-Петербург', 15, 190000),
+    ('Новосибирск', 6, 110000),
+    ('Екатеринбург', 6, 120000),
+    ('Казань', 5, 130000),
+    ('Нижний Новгород', 4, 105000),
+    ('Краснодар', 4, 115000),
+    ('Самара', 3, 90000),
+    ('Омск', 3, 75000),
+    ('Пермь', 3, 85000),
+    ('Тула', 2, 80000),
+    ('Сочи', 2, 250000),
+    ('Кострома', 1, 60000),
+    ('Вологда', 1, 70000),
+]
+DISTRICTS = [
+    'Центральный', 'Северный', 'Южный', 'Западный', 'Восточный',
+    'Заречный', 'Ленинский', 'Октябрьский', 'Советский', '',
+]
+STREETS = [
+    'Ленина', 'Мира', 'Советская', 'Гагарина', 'Пушкина', 'Садовая',
+    'Молодёжная', 'Школьная', 'Лесная', 'Набережная', 'Победы', 'Заводская',
+]
+PHRASES = [
+    'Светлая квартира с ремонтом.',
+    'Просторная кухня, раздельный санузел.',
+    'Есть балкон с видом на парк.',
+    'Рядом метро, школа и детский сад.',
+    'Тихий двор, закрытая территория.',
+    'Продаётся без мебели, свободная продажа.',
+    'Новый дом, консьерж и подземный паркинг.',
+    'Требуется косметический ремонт.',
+    'Окна во двор, высокие потолки.',
+    'Один собственник, документы готовы.',
+]
+FIRST_NAMES = ['Иван', 'Пётр', 'Анна', 'Мария', 'Сергей', 'Ольга', 'Алексей']
+LAST_NAMES = ['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов']
+PATRONYMICS = ['Иванович', 'Петрович', 'Сергеевич', 'Алексеевич']
+RAW_PHONE_FORMATS = [
+    '+7 9{0:02d} {1:03d}-{2:02d}-{3:02d}',
+    '8 (9{0:02d}) {1:03d}{2:02d}{3:02d}',
+    '89{0:02d}{1:03d}{2:02d}{3:02d}',
+    '9{0:02d}-{1:03d}-{2:02d}-{3:02d}',
+]
+
+
+def make_raw_phone(rng):
+    """Номер в одном из форматов, в которых телефоны вводят люди."""
+    if rng.random() < 0.05:
+        return rng.choice(['', '123456789', '0000000', '+7 999 999-99-99'])
+    parts = (
+        rng.randrange(100), rng.randrange(1000),
+        rng.randrange(100), rng.randrange(100)
+    )
+    return rng.choice(RAW_PHONE_FORMATS).format(*parts)
+
+
+def make_flat(rng, now):
+    town, _, meter_price = rng.choices(
+        TOWNS, weights=[weight for _, weight, _ in TOWNS]
+    )[0]
+    rooms = rng.choices([1, 2, 3, 4, 5], weights=[35, 35, 20, 7, 3])[0]
+    area = rooms * 15 + rng.randint(5, 25)
+    year = min(int(rng.triangular(1950, 2025, 2015)), 2024)
+    flat = Flat(
+        created_at=now - timedelta(minutes=rng.randrange(2 * 365 * 24 * 60)),
+        description=' '.join(rng.sample(PHRASES, rng.randint(1, 4))),
+        price=int(round(area * meter_price * rng.uniform(0.8, 1.3), -4)),
+        town=town,
+        town_district=rng.choice(DISTRICTS),
+        address=(
+            f'ул. {rng.choice(STREETS)}, д. {rng.randint(1, 120)}, '
+            f'кв. {rng.randint(1, 300)}'
+        ),
+        floor=str(rng.randint(1, 25)),
+        rooms_number=rooms,
+        living_area=area,
+        has_balcony=rng.choice([True, False, None]),
+        active=rng.random() < 0.9,
+        construction_year=year,
+    )
+    flat.update_new_building()
+    return flat
+
+
+def make_owner(rng):
+    phone = None
+    if rng.random() < 0.9:
+        phone = (
+            f'+79{rng.randrange(100):02d}{rng.randrange(1000):03d}'
+            f'{rng.randrange(10000):04d}'
+        )
+    return Owner(
+        full_name=' '.join([
+            rng.choice(LAST_NAMES),
+            rng.choice(FIRST_NAMES),
+            rng.choice(PATRONYMICS),
+        ]),
+        pure_phone=phone,
+    )
+
+
+def seed_users(rng, count):
+    User = get_user_model()
+    with transaction.atomic():
+        offset = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).count()
+        users = insert_returning_pks(User, [
+            User(username=f'{USERNAME_PREFIX}{offset + index}', password='!')
+            for index in range(count)
+        ])
+    return [user.pk for user in users]
+
+
+def seed_batch(rng, size, user_ids, owner_ids):
+    now = timezone.now()
+    version = Sequence.next_value(FLAT_VERSION_SEQUENCE)
+    flats = [make_flat(rng, now) for _ in range(size)]
+    for flat in flats:
+        flat.version = version
+    flat_ids = [flat.pk for flat in insert_returning_pks(Flat, flats)]
+
+    new_owners = insert_returning_pks(
+        Owner, [make_owner(rng) for _ in range(int(size * 0.7) or 1)]
+    )
+    owner_ids.extend(owner.pk for owner in new_owners)
+    links = {(rng.choice(owner_ids), flat_id) for flat_id in flat_ids}
+    links.update(
+        (rng.choice(owner_ids), rng.choice(flat_ids))
+        for _ in range(size // 10)
+    )
+    Owner.flats.through.objects.bulk_create(
+        [
+            Owner.flats.through(owner_id=owner_id, flat_id=flat_id)
+            for owner_id, flat_id in links
+        ],
+        ignore_conflicts=True
+    )
+
+    likes = {
+        (rng.choice(user_ids), rng.choice(flat_ids)) for _ in range(size // 2)
+    }
+    Flat.liked_by.through.objects.bulk_create(
+        [
+            Flat.liked_by.through(user_id=user_id, flat_id=flat_id)
+            for user_id, flat_id in likes
+        ],
+        ignore_conflicts=True
+    )
+    Complaint.objects.bulk_create(
+        Complaint(
+            user_id=rng.choice(user_ids),
+            flat_id=rng.choice(flat_ids),
+            text=rng.choice(['Цена не соответствует', 'Квартира продана', '']),
+        )
+        for _ in range(size // 50)
+    )
+
+
+def seed(size, batch_size=5000, seed=None):
+    """Заполняет базу квартирами, собственниками, лайками и жалобами.
+
+    Генератор: после каждой пачки отдаёт, сколько квартир уже создано.
+    В конце пересчитывает счётчики, справочник городов, поисковый
+    индекс и шарды, как после импорта.
+    """
+    rng = random.Random(seed)
+    user_ids = seed_users(rng, max(size // 50, 10))
+    owner_ids = []
+    created = 0
+    while created < size:
+        batch = min(batch_size, size - created)
+        with transaction.atomic():
+            seed_batch(rng, batch, user_ids, owner_ids)
+        created += batch
+        yield created
+
+    counters.rebuild_all()
+    towns.rebuild_towns()
+    search.index_flats()
+    if shards.get_shard_aliases():
+        shards.rebuild_shards()
+    bump_listing_version()
@@ -0,0 +1,110 @@
+import zlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from property.models import Flat
+
+
+CHUNK_SIZE = 500
+
+
+def get_shard_aliases():
+    return settings.FLAT_SHARDS
+
+
+def get_shard(town):
+    """Возвращает базу, в которой лежат квартиры города.
+
+    Город выбирается по crc32 от названия, а не по hash(): встроенный
+    hash строк меняется от запуска к запуску.
+    """
+    aliases = get_shard_aliases()
+    return aliases[zlib.crc32(town.encode()) % len(aliases)]
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _delete_from_shard(alias, flat_ids):
+    # Без ORM: delete() стал бы рассылать сигналы, которые пишут в основную базу.
+    table = Flat._meta.db_table
+    with connections[alias].cursor() as cursor:
+        for chunk in _chunks(flat_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ({placeholders})', chunk
+            )
+
+
+def _group_by_shard(flats):
+    by_shard = defaultdict(list)
+    for flat in flats:
+        by_shard[get_shard(flat.town)].append(flat)
+    return by_shard
+
+
+def sync_flats(flat_ids):
+    """Переносит актуальные копии квартир из основной базы в шарды.
+
+    Копия удаляется из всех шардов, поэтому смена города и удаление
+    квартиры обрабатываются так же, как обычное изменение.
+    """
+    aliases = get_shard_aliases()
+    if not aliases:
+        return
+    for chunk in _chunks(flat_ids):
+        by_shard = _group_by_shard(
+            Flat.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=chunk)
+        )
+        for alias in aliases:
+            with transaction.atomic(using=alias):
+                _delete_from_shard(alias, chunk)
+                Flat.objects.using(alias).bulk_create(by_shard[alias])
+
+
+def schedule_sync(flat_ids, using=DEFAULT_DB_ALIAS):
+    if not get_shard_aliases() or using != DEFAULT_DB_ALIAS:
+        return
+    flat_ids = list(flat_ids)
+    transaction.on_commit(lambda: sync_flats(flat_ids), using=using)
+
+
+def schedule_version_sync(version, using=DEFAULT_DB_ALIAS):
+    """Переносит в шарды квартиры, получившие version одним update().
+
+    Все строки одного QuerySet.update() получают одну версию, поэтому
+    их id не нужно собирать заранее: после коммита они ищутся по ней.
+    """
+    if not get_shard_aliases() or using != DEFAULT_DB_ALIAS:
+        return
+    transaction.on_commit(
+        lambda: sync_flats(Flat.objects.using(DEFAULT_DB_ALIAS).filter(
+            version=version
+        ).values_list('pk', flat=True)),
+        using=using
+    )
+
+
+def rebuild_shards(chunk_size=5000):
+    aliases = get_shard_aliases()
+    table = Flat._meta.db_table
+    for alias in aliases:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+
+    flats = Flat.objects.using(DEFAULT_DB_ALIAS).order_by('pk')
+    last_pk, copied = 0, 0
+    while aliases:
+        chunk = list(flats.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+        for alias, shard_flats in _group_by_shard(chunk).items():
+            Flat.objects.using(alias).bulk_create(shard_flats)
+        copied += len(chunk)
+    return copied
@@ -0,0 +1,182 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from property import counters, search, shards, towns
+from property.cache import bump_listing_version
+from property.models import (
+    FLAT_VERSION_SEQUENCE, Complaint, Flat, FlatTombstone, Owner, Sequence,
+    Town, flats_updated
+)
+
+
+User = get_user_model()
+
+
+COUNTED_ACTIONS = ('post_add', 'post_remove', 'post_clear')
+
+
+def _changed_ids(instance, action, reverse, pk_set, cleared_attr):
+    if not reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        return getattr(instance, cleared_attr, [])
+    return pk_set or []
+
+
+@receiver(m2m_changed, sender=Flat.liked_by.through)
+def update_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_flat_ids = list(
+            instance.liked_flats.values_list('pk', flat=True)
+        )
+    if action in COUNTED_ACTIONS:
+        counters.refresh_likes_count(_changed_ids(
+            instance, action, reverse, pk_set, '_cleared_flat_ids'
+        ))
+
+
+@receiver(m2m_changed, sender=Owner.flats.through)
+def update_flats_count(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_owner_ids = list(
+            instance.owners.values_list('pk', flat=True)
+        )
+    if action in COUNTED_ACTIONS:
+        counters.refresh_flats_count(_changed_ids(
+            instance, action, reverse, pk_set, '_cleared_owner_ids'
+        ))
+
+
+@receiver(post_init, sender=Complaint)
+def remember_complaint_flat(sender, instance, **kwargs):
+    instance._loaded_flat_id = instance.flat_id
+
+
+@receiver(post_save, sender=Complaint)
+def update_complaints_count_on_save(sender, instance, created, **kwargs):
+    flat_ids = {instance.flat_id}
+    if not created and instance._loaded_flat_id:
+        flat_ids.add(instance._loaded_flat_id)
+    counters.refresh_complaints_count(flat_ids)
+    instance._loaded_flat_id = instance.flat_id
+
+
+@receiver(post_delete, sender=Complaint)
+def update_complaints_count_on_delete(sender, instance, **kwargs):
+    counters.refresh_complaints_count([instance.flat_id])
+
+
+@receiver(pre_delete, sender=Flat)
+def remember_flat_owners(sender, instance, **kwargs):
+    instance._owner_ids = list(instance.owners.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Flat)
+def update_owners_on_flat_delete(sender, instance, **kwargs):
+    if instance._owner_ids:
+        counters.refresh_flats_count(instance._owner_ids)
+
+
+@receiver(pre_delete, sender=User)
+def remember_liked_flats(sender, instance, **kwargs):
+    instance._liked_flat_ids = list(
+        instance.liked_flats.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=User)
+def update_likes_on_user_delete(sender, instance, **kwargs):
+    if instance._liked_flat_ids:
+        counters.refresh_likes_count(instance._liked_flat_ids)
+
+
+@receiver(post_init, sender=Flat)
+def remember_flat_town(sender, instance, **kwargs):
+    instance._loaded_town = instance.__dict__.get('town')
+    instance._loaded_active = instance.__dict__.get('active')
+
+
+@receiver(post_save, sender=Flat)
+def update_town_on_save(sender, instance, created, **kwargs):
+    if created:
+        towns.adjust_town(instance.town, 1, int(instance.active))
+    elif instance._loaded_town is None:
+        towns.rebuild_towns([instance.town])
+    elif instance._loaded_town == instance.town:
+        towns.adjust_town(
+            instance.town,
+            active=int(instance.active) - int(bool(instance._loaded_active))
+        )
+    else:
+        towns.adjust_town(
+            instance._loaded_town, -1, -int(bool(instance._loaded_active))
+        )
+        towns.adjust_town(instance.town, 1, int(instance.active))
+    instance._loaded_town = instance.town
+    instance._loaded_active = instance.active
+
+
+@receiver(pre_delete, sender=Flat)
+def load_deleted_flat_town(sender, instance, using, **kwargs):
+    # Квартиру могли загрузить через only() без города или активности,
+    # а после удаления их уже не прочитать.
+    if instance._loaded_town is None or instance._loaded_active is None:
+        row = Flat._base_manager.using(using).filter(
+            pk=instance.pk
+        ).values_list('town', 'active').first()
+        if row is not None:
+            instance._loaded_town, instance._loaded_active = row
+
+
+@receiver(post_delete, sender=Flat)
+def update_town_on_delete(sender, instance, **kwargs):
+    towns.adjust_town(
+        instance._loaded_town, -1, -int(bool(instance._loaded_active))
+    )
+
+
+@receiver(post_save, sender=Town)
+@receiver(post_delete, sender=Town)
+def invalidate_town_names(sender, **kwargs):
+    towns.invalidate_town_names()
+
+
+@receiver(post_save, sender=Flat)
+@receiver(post_delete, sender=Flat)
+@receiver(post_save, sender=Owner)
+@receiver(post_delete, sender=Owner)
+@receiver(m2m_changed, sender=Owner.flats.through)
+def invalidate_listing_cache(sender, **kwargs):
+    bump_listing_version()
+
+
+@receiver(post_save, sender=Flat)
+def update_search_index(sender, instance, using, **kwargs):
+    search.index_flats([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Flat)
+def remove_from_search_index(sender, instance, using, **kwargs):
+    search.unindex_flat(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Flat)
+@receiver(post_delete, sender=Flat)
+def update_flat_shards(sender, instance, using, **kwargs):
+    shards.schedule_sync([instance.pk], using=using)
+
+
+@receiver(flats_updated, sender=Flat)
+def update_shards_after_update(sender, version, using, **kwargs):
+    shards.schedule_version_sync(version, using=using)
+
+
+@receiver(post_delete, sender=Flat)
+def create_flat_tombstone(sender, instance, using, **kwargs):
+    FlatTombstone.objects.using(using).create(
+        flat_id=instance.pk,
+        version=Sequence.next_value(FLAT_VERSION_SEQUENCE)
+    )
@@ -0,0 +1,559 @@
+import io
+import re
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+from django.test import (
+    Client, RequestFactory, TestCase, TransactionTestCase
+)
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from property.cache import get_listing_version
+from property.changes import DELETE, UPSERT, get_changes
+from property.complaints import complaint_buffer
+from property.importer import import_flats, read_csv, read_jsonl
+from property.buffers import WriteBuffer
+from property.likes import (
+    apply_likes, get_like_state, get_pending_key, set_like
+)
+from property.listing import (
+    SORT_ORDERS, filter_flats, get_flats_paginator, parse_listing_params
+)
+from property.models import Complaint, Flat, Owner, Town
+from property.pagination import MergedKeysetPaginator
+from property.plans import is_full_scan, iter_listing_plans
+from property.seed import seed
+from property.towns import get_town_names
+
+
+ROWS = 1000
+MAX_PAGES = 50
+
+COUNT_CHECKS = [
+    (Flat, {}),
+    (Flat, {'town': 'Бенчмарк'}),
+    (Owner, {}),
+    (Owner, {'q': 'Собственник'}),
+    (Complaint, {'q': 'Жалоба'}),
+]
+
+CAPPED_COUNT_RE = re.compile(r'LIMIT \d+\) subquery$')
+
+
+def is_full_count(sql):
+    return sql.startswith('SELECT COUNT(') and not CAPPED_COUNT_RE.search(sql)
+
+
+def has_estimate(params):
+    """Есть ли у списка оценка числа строк, см. estimate_count.
+
+    Для SQLite оценка есть только у таблицы без фильтров, остальные
+    списки считаются точно.
+    """
+    return connection.vendor == 'postgresql' or not params
+
+
+def create_flat(**fields):
+    values = {
+        'price': 1000000,
+        'town': 'Москва',
+        'address': 'ул. Тестовая',
+        'rooms_number': 1,
+        'active': True,
+    }
+    values.update(fields)
+    return Flat.objects.create(**values)
+
+
+def get_admin_request(params=None):
+    request = RequestFactory().get('/admin/', params or {})
+    request.user = get_user_model()(
+        username='admin', is_staff=True, is_superuser=True, is_active=True
+    )
+    return request
+
+
+class AdminChangelistTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Flat.objects.bulk_create(
+            Flat(
+                price=index,
+                town='Бенчмарк',
+                address=f'ул. Тестовая д.{index}',
+                floor='1',
+                rooms_number=1,
+                active=True
+            )
+            for index in range(ROWS)
+        )
+        Owner.objects.bulk_create(
+            Owner(full_name=f'Собственник {index}', pure_phone='+79161234567')
+            for index in range(ROWS)
+        )
+        flat_ids = list(Flat.objects.values_list('pk', flat=True))
+        owner_ids = list(Owner.objects.values_list('pk', flat=True))
+        Owner.flats.through.objects.bulk_create(
+            Owner.flats.through(owner_id=owner_id, flat_id=flat_id)
+            for owner_id, flat_id in zip(owner_ids, flat_ids)
+        )
+        user = get_user_model().objects.create(username='complainer')
+        Complaint.objects.bulk_create(
+            Complaint(user=user, flat_id=flat_id, text='Жалоба')
+            for flat_id in flat_ids
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def render_changelist(self, model, params=None):
+        model_admin = admin.site._registry[model]
+        with CaptureQueriesContext(connection) as queries:
+            model_admin.changelist_view(get_admin_request(params)).render()
+        return [query['sql'] for query in queries]
+
+    def test_flat_queries_do_not_depend_on_page_size(self):
+        model_admin = admin.site._registry[Flat]
+        # Прогрев: списки для фильтров кешируются при первом открытии.
+        self.render_changelist(Flat)
+        counts = {}
+        for size in [10, 100, ROWS]:
+            model_admin.list_per_page = size
+            try:
+                queries = self.render_changelist(Flat)
+            finally:
+                del model_admin.list_per_page
+            counts[size] = len(queries)
+            distinct = [
+                sql for sql in queries if sql.startswith('SELECT DISTINCT')
+            ]
+            self.assertEqual(distinct, [], 'Фильтры делают DISTINCT по квартирам')
+        self.assertEqual(len(set(counts.values())), 1, counts)
+
+    # Порог точного подсчёта занижен, чтобы тестовых строк было больше
+    # него, как на настоящих больших таблицах.
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=ROWS // 10)
+    def test_estimated_count_skips_full_count(self):
+        for model, params in COUNT_CHECKS:
+            with self.subTest(model=model.__name__, **params):
+                queries = self.render_changelist(model, params)
+                full = [sql for sql in queries if is_full_count(sql)]
+                if has_estimate(params):
+                    self.assertEqual(full, [])
+                queries = self.render_changelist(
+                    model, dict(params, exact_count='1')
+                )
+                full = [sql for sql in queries if is_full_count(sql)]
+                self.assertEqual(len(full), 1)
+
+
+class QueryPlansTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for _ in seed(2000, seed=1):
+            pass
+
+    def test_listing_pages_do_not_scan_flats(self):
+        """Ни одно сочетание фильтров главной не читает квартиры целиком."""
+        for name, plan in iter_listing_plans():
+            with self.subTest(name):
+                self.assertFalse(is_full_scan(plan), plan)
+
+
+class LikeFlatTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='liker')
+        cls.flat = create_flat()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.user)
+
+    def test_like_without_csrf_token_is_forbidden(self):
+        for method in [self.client.post, self.client.delete]:
+            response = method(f'/flats/{self.flat.pk}/like/')
+            self.assertEqual(response.status_code, 403)
+        self.assertIsNone(cache.get(get_pending_key(self.user.pk)))
+
+    def get_state(self):
+        self.flat.refresh_from_db()
+        return get_like_state(
+            self.user.pk, self.flat.pk, self.flat.likes_count
+        )
+
+    def test_like_is_visible_before_flush_and_counted_after(self):
+        buffer = WriteBuffer(apply_likes, background=False)
+        set_like(self.user.pk, self.flat.pk, True, buffer)
+        self.assertEqual(self.flat.liked_by.count(), 0)
+        self.assertEqual(self.get_state(), (True, 1))
+
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(self.flat.liked_by.count(), 1)
+        self.assertEqual(self.get_state(), (True, 1))
+        self.assertEqual(self.flat.likes_count, 1)
+
+        set_like(self.user.pk, self.flat.pk, False, buffer)
+        self.assertEqual(self.get_state(), (False, 0))
+        buffer.flush()
+        self.assertEqual(self.get_state(), (False, 0))
+        self.assertEqual(self.flat.likes_count, 0)
+
+    def test_buffer_keeps_last_intent_per_flat(self):
+        buffer = WriteBuffer(apply_likes, background=False)
+        set_like(self.user.pk, self.flat.pk, True, buffer)
+        set_like(self.user.pk, self.flat.pk, False, buffer)
+        set_like(self.user.pk, self.flat.pk, True, buffer)
+        self.assertEqual(len(buffer), 1)
+        buffer.flush()
+        self.assertEqual(self.get_state(), (True, 1))
+
+    def test_flush_drops_likes_of_deleted_flats(self):
+        buffer = WriteBuffer(apply_likes, background=False)
+        other = create_flat()
+        set_like(self.user.pk, other.pk, True, buffer)
+        set_like(self.user.pk, self.flat.pk, True, buffer)
+        other.delete()
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(self.get_state(), (True, 1))
+
+
+class ComplainAboutFlatTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='complainer')
+        cls.flat = create_flat()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        # Буфер пишется вручную: фоновый поток не видит транзакцию теста.
+        complaint_buffer.background = False
+        self.addCleanup(setattr, complaint_buffer, 'background', True)
+        self.addCleanup(complaint_buffer.pending.clear)
+
+    def complain(self, flat, text='Квартира продана'):
+        return self.client.post(
+            f'/flats/{flat.pk}/complaint/', {'text': text}
+        )
+
+    def test_complaint_without_csrf_token_is_forbidden(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(
+            f'/flats/{self.flat.pk}/complaint/', {'text': 'Продана'}
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(complaint_buffer), 0)
+
+    def test_complaint_is_accepted_and_written_on_flush(self):
+        response = self.complain(self.flat)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Complaint.objects.count(), 0)
+
+        complaint_buffer.flush()
+        self.assertEqual(
+            list(Complaint.objects.values_list('user', 'flat', 'text')),
+            [(self.user.pk, self.flat.pk, 'Квартира продана')]
+        )
+        self.flat.refresh_from_db()
+        self.assertEqual(self.flat.complaints_count, 1)
+
+    def test_repeated_complaint_is_conflict(self):
+        self.assertEqual(self.complain(self.flat).status_code, 202)
+        self.assertEqual(self.complain(self.flat).status_code, 409)
+        complaint_buffer.flush()
+        self.assertEqual(Complaint.objects.count(), 1)
+
+    @override_settings(COMPLAINTS_BURST=2)
+    def test_complaints_over_burst_are_rate_limited(self):
+        flats = [create_flat() for _ in range(3)]
+        statuses = [self.complain(flat).status_code for flat in flats]
+        self.assertEqual(statuses, [202, 202, 429])
+        self.assertEqual(len(complaint_buffer), 2)
+
+
+class TownNamesTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_public_list_skips_towns_without_active_flats(self):
+        create_flat(town='Москва')
+        flat = create_flat(town='Тверь', active=False)
+        self.assertEqual(get_town_names(), ['Москва', 'Тверь'])
+        self.assertEqual(get_town_names(active_only=True), ['Москва'])
+
+        flat.active = True
+        flat.save()
+        self.assertEqual(
+            get_town_names(active_only=True), ['Москва', 'Тверь']
+        )
+        flat.active = False
+        flat.save()
+        self.assertEqual(get_town_names(active_only=True), ['Москва'])
+
+    def test_deleting_deferred_flat_updates_town_counts(self):
+        create_flat(town='Москва')
+        flat = create_flat(town='Тверь')
+        Flat.objects.only('pk').get(pk=flat.pk).delete()
+        town = Town.objects.get(name='Тверь')
+        self.assertEqual(
+            (town.flats_count, town.active_flats_count), (0, 0)
+        )
+        self.assertEqual(get_town_names(), ['Москва'])
+
+        flat = create_flat(town='Тверь')
+        Flat.objects.filter(pk=flat.pk).only('pk').delete()
+        town.refresh_from_db()
+        self.assertEqual(town.flats_count, 0)
+
+    def test_show_flats_offers_towns_with_active_flats(self):
+        create_flat(town='Москва')
+        create_flat(town='Тверь', active=False)
+        response = self.client.get('/')
+        self.assertEqual(response.context['towns'], ['Москва'])
+
+
+class ImportFlatsTest(TestCase):
+
+    def import_rows(self, rows):
+        flats_total, errors_total = 0, []
+        for flats, _, errors in import_flats(rows):
+            flats_total += flats
+            errors_total.extend(errors)
+        return flats_total, errors_total
+
+    def test_bad_jsonl_lines_become_row_errors(self):
+        stream = io.StringIO(
+            '{"price": 100, "town": "Москва", "address": "x", '
+            '"rooms_number": 1}\n'
+            '{"price": 200, \n'
+            '\n'
+            '[1, 2]\n'
+            '{"price": 300, "town": "Москва", "address": "y", '
+            '"rooms_number": 2, "has_balcony": "yes"}\n'
+        )
+        flats, errors = self.import_rows(read_jsonl(stream))
+        self.assertEqual(flats, 2)
+        self.assertEqual([line for line, _ in errors], [2, 3])
+        self.assertTrue(Flat.objects.get(price=300).has_balcony)
+
+    def test_csv_booleans_accept_words(self):
+        stream = io.StringIO(
+            'price,town,address,rooms_number,active,has_balcony\n'
+            '100,Москва,x,1,true,no\n'
+            '200,Москва,y,1,False,Yes\n'
+            '300,Москва,z,1,может быть,\n'
+        )
+        flats, errors = self.import_rows(read_csv(stream))
+        self.assertEqual(flats, 2)
+        self.assertEqual([line for line, _ in errors], [3])
+        self.assertEqual(
+            list(Flat.objects.order_by('price').values_list(
+                'active', 'has_balcony'
+            )),
+            [(True, False), (False, True)]
+        )
+
+
+class KeysetPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Повторяющиеся цены, даты и площади проверяют, что при равных
+        # значениях порядок держит id.
+        # У каждой четвёртой квартиры нет площади: в сортировке по
+        # площади они идут в конце, а не пропадают.
+        created_at = timezone.now()
+        for index in range(23):
+            create_flat(
+                town=['Москва', 'Тверь'][index % 2],
+                price=1000000 + index % 5 * 100000,
+                created_at=created_at - timezone.timedelta(days=index % 4),
+                living_area=None if index % 4 == 3 else 30 + index % 3 * 10,
+                description='Балкон на юг' * (index % 3 + 1),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, paginator, cursor=None, direction='next_cursor'):
+        pages = []
+        for _ in range(MAX_PAGES):
+            page = paginator.page(cursor)
+            pages.append(page)
+            cursor = getattr(page, direction)
+            if cursor is None:
+                return pages
+        self.fail(f'Больше {MAX_PAGES} страниц: курсор не двигается')
+
+    def get_pks(self, pages):
+        return [flat.pk for page in pages for flat in page]
+
+    def assert_walks(self, paginator, expected):
+        forward = self.walk(paginator)
+        self.assertEqual(self.get_pks(forward), expected)
+        self.assertEqual(len(forward), 5)
+
+        backward = self.walk(paginator, forward[-1].prev_cursor, 'prev_cursor')
+        self.assertEqual(
+            self.get_pks(reversed(backward)) + self.get_pks(forward[-1:]),
+            expected
+        )
+        self.assertIsNone(backward[-1].prev_cursor)
+
+    def get_expected(self, flats, sort):
+        ordering = [
+            F('living_area').desc(nulls_last=True)
+            if name == '-living_area' else name
+            for name in SORT_ORDERS[sort]
+        ]
+        return list(flats.order_by(*ordering).values_list('pk', flat=True))
+
+    def test_walks_match_full_ordering(self):
+        for sort in SORT_ORDERS:
+            query = {'sort': sort}
+            if sort == 'relevance':
+                query['q'] = 'балкон'
+            params = parse_listing_params(query)
+            with self.subTest(sort=sort):
+                flats = filter_flats(params)
+                expected = self.get_expected(flats, sort)
+                self.assertEqual(len(expected), 23)
+                self.assert_walks(
+                    get_flats_paginator(flats, params, per_page=5), expected
+                )
+
+    def test_merged_walks_match_full_ordering(self):
+        """Слияние шардов: каждый город — отдельный queryset."""
+        for sort in SORT_ORDERS:
+            query = {'sort': sort}
+            if sort == 'relevance':
+                query['q'] = 'балкон'
+            params = parse_listing_params(query)
+            with self.subTest(sort=sort):
+                flats = filter_flats(params)
+                paginator = MergedKeysetPaginator(
+                    [flats.filter(town='Москва'), flats.filter(town='Тверь')],
+                    SORT_ORDERS[sort],
+                    per_page=5
+                )
+                self.assert_walks(paginator, self.get_expected(flats, sort))
+
+    def test_invalid_cursor_in_api_is_bad_request(self):
+        response = self.client.get('/api/flats/', {'cursor': 'не курсор'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor_on_listing_shows_first_page(self):
+        first_page = self.client.get('/').context['flats']
+        cache.clear()
+        response = self.client.get('/', {'cursor': 'не курсор'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [flat.pk for flat in response.context['flats']],
+            [flat.pk for flat in first_page],
+        )
+
+
+class ChangeFeedTest(TestCase):
+
+    def get_ops(self, changes):
+        return [(change['op'], change['id']) for change in changes]
+
+    def test_save_moves_flat_to_end_of_feed(self):
+        first, second = create_flat(), create_flat()
+        changes = get_changes()
+        self.assertEqual(
+            self.get_ops(changes), [(UPSERT, first.pk), (UPSERT, second.pk)]
+        )
+        self.assertLess(changes[0]['version'], changes[1]['version'])
+
+        first.price = 2000000
+        first.save()
+        last = changes[-1]
+        changes = get_changes(last['version'], last['id'])
+        self.assertEqual(self.get_ops(changes), [(UPSERT, first.pk)])
+        self.assertGreater(changes[0]['version'], last['version'])
+        self.assertEqual(changes[0]['flat'].price, 2000000)
+
+    def test_update_gives_one_version_and_resumes_by_id(self):
+        flats = [create_flat() for _ in range(3)]
+        start = get_changes()[-1]
+        Flat.objects.filter(pk__in=[flat.pk for flat in flats]).update(
+            price=3000000
+        )
+
+        seen, since, after = [], start['version'], start['id']
+        while True:
+            changes = get_changes(since, after, limit=2)
+            if not changes:
+                break
+            seen.extend(changes)
+            since, after = changes[-1]['version'], changes[-1]['id']
+        self.assertEqual(
+            self.get_ops(seen), [(UPSERT, flat.pk) for flat in flats]
+        )
+        self.assertEqual(len({change['version'] for change in seen}), 1)
+        self.assertGreater(seen[0]['version'], start['version'])
+
+    def test_counter_update_keeps_version(self):
+        flat = create_flat()
+        last = get_changes()[-1]
+        Flat.objects.filter(pk=flat.pk).update(likes_count=5)
+        self.assertEqual(get_changes(last['version'], last['id']), [])
+
+    def test_api_rejects_non_numeric_position(self):
+        flat = create_flat()
+        for query in [{'since': 'abc'}, {'since': '0', 'after': '1.5'}]:
+            response = self.client.get('/api/flats/changes/', query)
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/flats/changes/', {'since': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [change['id'] for change in response.json()['results']],
+            [flat.pk]
+        )
+
+    def test_delete_leaves_tombstone(self):
+        kept, deleted = create_flat(), create_flat()
+        last = get_changes()[-1]
+        deleted_id = deleted.pk
+        deleted.delete()
+
+        changes = get_changes(last['version'], last['id'])
+        self.assertEqual(self.get_ops(changes), [(DELETE, deleted_id)])
+        self.assertGreater(changes[0]['version'], last['version'])
+        self.assertEqual(
+            self.get_ops(get_changes()),
+            [(UPSERT, kept.pk), (DELETE, deleted_id)]
+        )
+
+
+class ListingCacheTest(TransactionTestCase):
+    """Кеш сбрасывается после коммита, поэтому тесты без общей транзакции."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_queryset_update_resets_listing_cache(self):
+        flat = create_flat()
+        version = get_listing_version()
+        Flat.objects.filter(pk=flat.pk).update(price=2000000)
+        self.assertNotEqual(get_listing_version(), version)
+
+    def test_counter_update_keeps_listing_cache(self):
+        flat = create_flat()
+        version = get_listing_version()
+        Flat.objects.filter(pk=flat.pk).update(likes_count=3)
+        self.assertEqual(get_listing_version(), version)
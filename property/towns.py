@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Q
+
+from property.models import Flat, Town
+
+
+TOWN_NAMES_CACHE_KEY = 'property:town-names'
+ACTIVE_TOWN_NAMES_CACHE_KEY = 'property:active-town-names'
+
+
+def is_missing_from_names(name, cache_key):
+    return name not in (cache.get(cache_key) or [name])
+
+
+def adjust_town(name, flats=0, active=0):
+    if not name or not (flats or active):
+        return
+    updated = Town.objects.filter(name=name).update(
+        flats_count=F('flats_count') + flats,
+        active_flats_count=F('active_flats_count') + active,
+    )
+    if not updated:
+        Town.objects.get_or_create(name=name)
+        adjust_town(name, flats, active)
+    elif flats < 0 or active < 0:
+        # У города могли кончиться квартиры или активные объявления.
+        invalidate_town_names()
+    elif (
+        flats > 0 and is_missing_from_names(name, TOWN_NAMES_CACHE_KEY)
+    ) or (
+        active > 0 and is_missing_from_names(name, ACTIVE_TOWN_NAMES_CACHE_KEY)
+    ):
+        # Город, которого не было в списке, снова в нём появляется.
+        invalidate_town_names()
+
+
+def get_town_names(active_only=False):
+    """Города, в которых есть квартиры, по алфавиту.
+
+    active_only — только города с активными объявлениями, как на
+    главной странице; админке нужны все.
+
+    Кеш сбрасывают сигналы Town и пересчёты справочника. Команды
+    и другие процессы могут не видеть общий кеш, поэтому у ключа
+    есть и срок жизни TOWN_NAMES_CACHE_TIMEOUT.
+    """
+    if active_only:
+        cache_key = ACTIVE_TOWN_NAMES_CACHE_KEY
+        condition = Q(active_flats_count__gt=0)
+    else:
+        cache_key = TOWN_NAMES_CACHE_KEY
+        condition = Q(flats_count__gt=0)
+    names = cache.get(cache_key)
+    if names is None:
+        # Список общий для всех, поэтому читается с основной базы,
+        # а не с отстающей реплики.
+        names = list(Town.objects.using(DEFAULT_DB_ALIAS).filter(
+            condition
+        ).values_list('name', flat=True))
+        cache.set(cache_key, names, settings.TOWN_NAMES_CACHE_TIMEOUT)
+    return names
+
+
+def invalidate_town_names():
+    cache.delete_many([TOWN_NAMES_CACHE_KEY, ACTIVE_TOWN_NAMES_CACHE_KEY])
+
+
+def rebuild_towns(names=None):
+    """Пересчитывает справочник городов одним GROUP BY по квартирам.
+
+    names — пересчитать только эти города, None — весь справочник.
+    """
+    flats = Flat.objects.exclude(town='')
+    towns = Town.objects.all()
+    if names is not None:
+        names = set(names)
+        flats = flats.filter(town__in=names)
+        towns = towns.filter(name__in=names)
+
+    counts = {
+        row['town']: row
+        for row in flats.order_by().values('town').annotate(
+            total=Count('pk'),
+            active_total=Count('pk', filter=Q(active=True)),
+        )
+    }
+    with transaction.atomic():
+        existing = {town.name: town for town in towns.select_for_update()}
+        for name, town in existing.items():
+            row = counts.get(name, {})
+            town.flats_count = row.get('total', 0)
+            town.active_flats_count = row.get('active_total', 0)
+        Town.objects.bulk_update(
+            existing.values(),
+            ['flats_count', 'active_flats_count'],
+            batch_size=500
+        )
+        Town.objects.bulk_create(
+            [
+                Town(
+                    name=name,
+                    flats_count=row['total'],
+                    active_flats_count=row['active_total'],
+                )
+                for name, row in counts.items()
+                if name not in existing
+            ]
+        )
+    invalidate_town_names()
+    return len(counts)
@@ -1,39 +1,304 @@
-from django.shortcuts import render
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    Http404, HttpResponse, JsonResponse, QueryDict, StreamingHttpResponse
+)
+from django.shortcuts import get_object_or_404, render
+from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.http import condition, require_http_methods
+
+from property.cache import (
+    get_listing_cache_key, get_listing_last_modified, get_listing_page,
+    get_listing_version, is_listing_settled, set_listing_page
+)
+from property.changes import get_changes
+from property.complaints import (
+    ACCEPTED, DUPLICATE, RATE_LIMITED, submit_complaint
+)
+from property.export import EXPORT_FORMATS, iter_flats
+from property.facets import get_facets
+from property.likes import get_like_state, set_like
+from property.listing import (
+    RANGE_FILTERS, SORT_ORDERS, filter_flats, get_flats_paginator,
+    parse_int, parse_listing_params
+)
 from property.models import Flat
+from property.pagination import InvalidCursor
+from property.routers import iter_from_replica, read_from_replica
+from property.towns import get_town_names
 
 
-def format_price(value):
-    try:
-        return int(value)
-    except (TypeError, ValueError):
+FLATS_PER_PAGE = 10
+RANGE_TITLES = {
+    'rooms': 'Комнат',
+    'area': 'Жилая площадь, кв.м.',
+    'floor': 'Этаж',
+    'year': 'Год постройки',
+}
+
+
+def get_range_inputs(params):
+    return [
+        {
+            'name': name,
+            'title': RANGE_TITLES[name],
+            'min': params[f'min_{name}'],
+            'max': params[f'max_{name}'],
+        }
+        for name in RANGE_FILTERS
+    ]
+
+
+def get_page_url(params, cursor):
+    if cursor is None:
         return None
+    query = QueryDict(mutable=True)
+    for name, value in params.items():
+        if value is True:
+            query[name] = '1'
+        elif value:
+            query[name] = value
+    query['cursor'] = cursor
+    return f'?{query.urlencode()}'
 
 
+def get_show_flats_cache_key(request):
+    if not hasattr(request, 'listing_cache_key'):
+        params = parse_listing_params(request.GET)
+        params['cursor'] = request.GET.get('cursor') or None
+        request.listing_cache_key = get_listing_cache_key(params)
+    return request.listing_cache_key
+
+
+def get_show_flats_etag(request):
+    if not is_listing_settled():
+        return None
+    cache_key = get_show_flats_cache_key(request)
+    return hashlib.md5(cache_key.encode()).hexdigest()
+
+
+@read_from_replica
+@condition(etag_func=get_show_flats_etag)
 def show_flats(request):
-    town = request.GET.get('town')
-    min_price = format_price(request.GET.get('min_price'))
-    max_price = format_price(request.GET.get('max_price'))
-    new_building = request.GET.get('new_building') == '1'
-
-    flats = Flat.objects.all()
-    
-    if town:
-        flats = flats.filter(town=town)
-    if min_price:
-        flats = flats.filter(price__gt=min_price)
-    if max_price:
-        flats = flats.filter(price__lt=max_price)
-    if new_building:
-        flats = flats.filter(construction_year__gte=2015)
-
-    towns = Flat.objects.values_list(
-        'town', flat=True).distinct().order_by('town')
-    
-    return render(request, 'flats_list.html', {
-        'flats': flats[:10],
-        'towns': towns,
-        'active_town': town,
-        'max_price': max_price,
-        'min_price': min_price,
-        'new_building': new_building
-    })
\ No newline at end of file
+    cache_key = get_show_flats_cache_key(request)
+    content = get_listing_page(cache_key)
+    if content is not None:
+        return HttpResponse(content)
+
+    params = parse_listing_params(request.GET)
+    flats = filter_flats(params)
+
+    paginator = get_flats_paginator(flats, params, FLATS_PER_PAGE)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page = paginator.page()
+
+    response = render(request, 'flats_list.html', {
+        'flats': page,
+        'card_cache_timeout': settings.FLAT_CARD_CACHE_TIMEOUT,
+        'q': params['q'],
+        'next_page_url': get_page_url(params, page.next_cursor),
+        'prev_page_url': get_page_url(params, page.prev_cursor),
+        'towns': get_town_names(active_only=True),
+        'active_town': params['town'],
+        'max_price': params['max_price'],
+        'min_price': params['min_price'],
+        'new_building': params['new_building'],
+        'ranges': get_range_inputs(params),
+        'sort': params['sort']
+    })
+    if is_listing_settled():
+        set_listing_page(cache_key, response.content)
+    return response
+
+
+@staff_member_required
+def export_flats(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise Http404('Неизвестный формат выгрузки')
+    serialize, content_type = EXPORT_FORMATS[export_format]
+
+    flats = filter_flats(parse_listing_params(request.GET), only_active=False)
+    response = StreamingHttpResponse(
+        iter_from_replica(serialize(iter_flats(flats))),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="flats.{export_format}"'
+    )
+    return response
+
+
+API_FIELDS = [
+    'id',
+    'created_at',
+    'description',
+    'price',
+    'town',
+    'town_district',
+    'address',
+    'floor',
+    'rooms_number',
+    'living_area',
+    'has_balcony',
+    'active',
+    'construction_year',
+    'new_building',
+]
+API_DEFAULT_FIELDS = [name for name in API_FIELDS if name != 'description']
+API_DEFAULT_LIMIT = 20
+API_MAX_LIMIT = 100
+
+
+def get_api_fields(request):
+    fields = request.GET.get('fields')
+    if not fields:
+        return API_DEFAULT_FIELDS
+    fields = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = set(fields) - set(API_FIELDS)
+    if unknown:
+        raise ValueError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return fields
+
+
+def get_api_limit(request):
+    limit = parse_int(request.GET.get('limit')) or API_DEFAULT_LIMIT
+    return min(max(limit, 1), API_MAX_LIMIT)
+
+
+def get_feed_position(request, name):
+    position = parse_int(request.GET.get(name) or 0)
+    if position is None:
+        raise ValueError(f'{name} должен быть целым числом')
+    return position
+
+
+def get_flats_api_etag(request):
+    if not is_listing_settled():
+        return None
+    key = json.dumps([
+        get_listing_version(),
+        parse_listing_params(request.GET),
+        request.GET.get('fields'),
+        request.GET.get('limit'),
+        request.GET.get('cursor'),
+    ], sort_keys=True)
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def get_flats_api_last_modified(request):
+    if not is_listing_settled():
+        return None
+    return get_listing_last_modified()
+
+
+@read_from_replica
+@condition(
+    etag_func=get_flats_api_etag,
+    last_modified_func=get_flats_api_last_modified
+)
+def flats_api(request):
+    try:
+        fields = get_api_fields(request)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    params = parse_listing_params(request.GET)
+    ordering = SORT_ORDERS[params['sort']]
+
+    loaded_fields = set(fields) | {
+        name.lstrip('-') for name in ordering if name.lstrip('-') in API_FIELDS
+    }
+    flats = filter_flats(params).only(*loaded_fields)
+    paginator = get_flats_paginator(flats, params, get_api_limit(request))
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Неверный курсор'}, status=400)
+
+    api_params = dict(params, fields=request.GET.get('fields'))
+    api_params['limit'] = request.GET.get('limit')
+    return JsonResponse({
+        'results': [
+            {name: getattr(flat, name) for name in fields}
+            for flat in page
+        ],
+        'next': get_page_url(api_params, page.next_cursor),
+        'previous': get_page_url(api_params, page.prev_cursor),
+    })
+
+
+@read_from_replica
+def flats_changes(request):
+    try:
+        fields = get_api_fields(request)
+        since = get_feed_position(request, 'since')
+        after = get_feed_position(request, 'after')
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    changes = get_changes(since, after, get_api_limit(request), fields)
+    for change in changes:
+        flat = change.pop('flat', None)
+        if flat is not None:
+            change['flat'] = {name: getattr(flat, name) for name in fields}
+    if changes:
+        since, after = changes[-1]['version'], changes[-1]['id']
+
+    query = request.GET.copy()
+    query['since'] = since
+    query['after'] = after
+    return JsonResponse({
+        'results': changes,
+        'since': since,
+        'after': after,
+        'next': f'?{query.urlencode()}',
+    })
+
+
+@read_from_replica
+def flats_facets(request):
+    params = parse_listing_params(request.GET)
+    params.pop('sort')
+    return JsonResponse(get_facets(params))
+
+
+@csrf_protect
+@require_http_methods(['POST', 'DELETE'])
+def like_flat(request, flat_id):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти на сайт'}, status=401)
+    flat = get_object_or_404(
+        Flat.objects.only('pk', 'likes_count'), pk=flat_id
+    )
+
+    set_like(request.user.pk, flat.pk, request.method == 'POST')
+    liked, likes_count = get_like_state(
+        request.user.pk, flat.pk, flat.likes_count
+    )
+    return JsonResponse({'liked': liked, 'likes_count': likes_count})
+
+
+COMPLAINT_RESPONSES = {
+    ACCEPTED: ({'status': 'accepted'}, 202),
+    DUPLICATE: ({'error': 'Вы уже жаловались на это объявление'}, 409),
+    RATE_LIMITED: ({'error': 'Слишком много жалоб, попробуйте позже'}, 429),
+}
+
+
+@csrf_protect
+@require_http_methods(['POST'])
+def complain_about_flat(request, flat_id):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти на сайт'}, status=401)
+    flat = get_object_or_404(Flat.objects.only('pk'), pk=flat_id)
+
+    result = submit_complaint(
+        request.user.pk, flat.pk, request.POST.get('text', '')
+    )
+    data, status = COMPLAINT_RESPONSES[result]
+    return JsonResponse(data, status=status)
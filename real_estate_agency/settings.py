@@ -31,22 +31,28 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'property.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     # 'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'property.middleware.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'real_estate_agency.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'property.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -54,6 +60,9 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
         },
     },
 ]
@@ -100,3 +109,65 @@ DATABASES = {
         os.getenv('DATABASE', 'sqlite:///db.sqlite3')
     ),
 }
+
+if os.getenv('DATABASE_REPLICA'):
+    DATABASES['replica'] = dj_database_url.parse(os.getenv('DATABASE_REPLICA'))
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+FLAT_SHARDS = []
+for number, url in enumerate(env.list('FLAT_SHARDS', [])):
+    alias = f'flats_{number}'
+    DATABASES[alias] = dj_database_url.parse(url)
+    FLAT_SHARDS.append(alias)
+
+DATABASE_ROUTERS = [
+    'property.routers.FlatShardRouter',
+    'property.routers.PrimaryReplicaRouter',
+]
+
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', 10)
+
+CACHES = {
+    'default': {
+        'BACKEND': env.str(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': env.str('CACHE_LOCATION', 'real-estate-agency'),
+    },
+}
+
+LISTING_CACHE_TIMEOUT = env.int('LISTING_CACHE_TIMEOUT', 600)
+FLAT_CARD_CACHE_TIMEOUT = env.int('FLAT_CARD_CACHE_TIMEOUT', 24 * 60 * 60)
+TOWN_NAMES_CACHE_TIMEOUT = env.int('TOWN_NAMES_CACHE_TIMEOUT', 60)
+
+ADMIN_EXACT_COUNT_LIMIT = env.int('ADMIN_EXACT_COUNT_LIMIT', 10000)
+
+REQUEST_PROFILING_RATE = env.float(
+    'REQUEST_PROFILING_RATE', 1.0 if DEBUG else 0.01
+)
+SLOW_REQUEST_MS = env.int('SLOW_REQUEST_MS', 500)
+N_PLUS_ONE_THRESHOLD = env.int('N_PLUS_ONE_THRESHOLD', 5)
+
+LIKES_BUFFER_SIZE = env.int('LIKES_BUFFER_SIZE', 1000)
+LIKES_FLUSH_INTERVAL = env.float('LIKES_FLUSH_INTERVAL', 1.0)
+LIKES_PENDING_TIMEOUT = 300
+
+COMPLAINTS_BUFFER_SIZE = env.int('COMPLAINTS_BUFFER_SIZE', 500)
+COMPLAINTS_FLUSH_INTERVAL = env.float('COMPLAINTS_FLUSH_INTERVAL', 2.0)
+COMPLAINTS_RATE = env.float('COMPLAINTS_RATE', 1 / 60)
+COMPLAINTS_BURST = env.int('COMPLAINTS_BURST', 5)
+COMPLAINTS_DEDUP_TIMEOUT = 24 * 60 * 60
+
+NEW_BUILDING_YEAR = env.int('NEW_BUILDING_YEAR', 2015)
+
+FLAT_PRICE_BUCKETS = env.list(
+    'FLAT_PRICE_BUCKETS',
+    [3000000, 5000000, 8000000, 12000000],
+    subcast=int
+)
+CONSTRUCTION_YEAR_BUCKETS = env.list(
+    'CONSTRUCTION_YEAR_BUCKETS',
+    [1960, 1980, 2000, 2010, 2015, 2020],
+    subcast=int
+)
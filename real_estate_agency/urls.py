@@ -6,5 +6,11 @@ from property import views
 urlpatterns = [
     url(r'^$', views.show_flats),
     url(r'^search/$', views.show_flats),
+    url(r'^export/flats/$', views.export_flats),
+    url(r'^api/flats/$', views.flats_api),
+    url(r'^api/flats/facets/$', views.flats_facets),
+    url(r'^api/flats/changes/$', views.flats_changes),
+    url(r'^flats/(?P<flat_id>\d+)/like/$', views.like_flat),
+    url(r'^flats/(?P<flat_id>\d+)/complaint/$', views.complain_about_flat),
     url(r'^admin/', admin.site.urls),
 ]